@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2025-10-27 09:12
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0021_plcommentfile'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='financialdata',
+            index=models.Index(fields=['data_type', 'period', 'account_code', 'company'], include=['amount'], name='fd_pl_covering_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='chartofaccounts',
+            index=models.Index(fields=['account_type', 'sub_category', 'sort_order'], name='coa_type_subcat_sort_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2025-10-27 10:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_report_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chartofaccounts',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
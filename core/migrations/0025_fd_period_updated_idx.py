@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2025-10-28 11:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0024_report_data_updated_at'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='financialdata',
+            index=models.Index(fields=['period', 'updated_at'], name='fd_period_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2025-10-29 09:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0025_fd_period_updated_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='hubspotdata',
+            index=models.Index(fields=['-synced_at', '-id'], name='hubspot_synced_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='hubspotdata',
+            index=models.Index(fields=['record_type', '-synced_at', '-id'], name='hubspot_type_synced_idx'),
+        ),
+    ]
@@ -28,6 +28,7 @@ class FinancialData(models.Model):
     period = models.DateField()
     amount = models.DecimalField(max_digits=15, decimal_places=2)
     data_type = models.CharField(max_length=20, choices=DATA_TYPES)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.company.code} - {self.account_code} - {self.period} - {self.amount}"
@@ -35,6 +36,16 @@ class FinancialData(models.Model):
     class Meta:
         verbose_name_plural = "Financial Data"
         unique_together = ['company', 'account_code', 'period', 'data_type']
+        indexes = [
+            # Covers the P&L report filters; INCLUDE lets Postgres answer them index-only
+            models.Index(
+                fields=['data_type', 'period', 'account_code', 'company'],
+                include=['amount'],
+                name='fd_pl_covering_idx',
+            ),
+            # Lets the report cache version token (COUNT/MAX(updated_at) per period window) run index-only
+            models.Index(fields=['period', 'updated_at'], name='fd_period_updated_idx'),
+        ]
 
 class ChartOfAccounts(models.Model):
     ACCOUNT_TYPES = [
@@ -53,6 +64,7 @@ class ChartOfAccounts(models.Model):
     formula = models.TextField(blank=True)
     sort_order = models.IntegerField()
     is_header = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         if self.account_code:
@@ -63,6 +75,9 @@ class ChartOfAccounts(models.Model):
     class Meta:
         verbose_name_plural = "Chart of Accounts"
         ordering = ['sort_order']
+        indexes = [
+            models.Index(fields=['account_type', 'sub_category', 'sort_order'], name='coa_type_subcat_sort_idx'),
+        ]
 
 class SalaryData(models.Model):
     employee_id = models.CharField(max_length=50)
@@ -121,6 +136,7 @@ class CFDashboardData(models.Model):
     period = models.DateField()
     metric = models.ForeignKey(CFDashboardMetric, on_delete=models.CASCADE)
     value = models.DecimalField(decimal_places=2, max_digits=15, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['company', 'period', 'metric']
@@ -143,6 +159,7 @@ class CFDashboardBudget(models.Model):
         choices=[('budget', 'Budget'), ('forecast', 'Forecast')],
         default='budget'
     )
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ('metric', 'period', 'data_type')
@@ -247,6 +264,11 @@ class HubSpotData(models.Model):
     class Meta:
         unique_together = ('record_type', 'hubspot_id')
         ordering = ['record_type', 'hubspot_id']
+        indexes = [
+            # Keyset pagination of the HubSpot data API (newest first, id as tiebreaker)
+            models.Index(fields=['-synced_at', '-id'], name='hubspot_synced_idx'),
+            models.Index(fields=['record_type', '-synced_at', '-id'], name='hubspot_type_synced_idx'),
+        ]
         verbose_name = 'HubSpot Data Record'
         verbose_name_plural = 'HubSpot Data Records'
 
@@ -1,13 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.core.exceptions import ImproperlyConfigured
 from django.utils.timezone import make_naive
-from django.db.models import Q, Sum, Min
+from django.db.models import Q, Sum, Max, Count, Prefetch, TextField, Window
+from django.db import connection, transaction
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import Abs, Cast
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_http_methods
 from django.utils.text import slugify
+from django.core.cache import cache
 from .models import (
     Company,
     FinancialData,
@@ -15,6 +20,7 @@ from .models import (
     DataBackup,
     CFDashboardMetric,
     CFDashboardData,
+    CFDashboardBudget,
     ActiveState,
     SalaryData,
     PLComment,
@@ -26,7 +32,9 @@ from .forms import ActiveStateForm
 from .feature_flags import is_enabled
 from .services.hubspot_service import HubSpotService
 import pandas as pd
+import numpy as np
 import csv
+import io
 from datetime import datetime, date
 import json
 import re
@@ -35,10 +43,93 @@ import logging
 from dateutil.relativedelta import relativedelta
 import calendar
 import openpyxl.styles
+import base64
 import copy
+import hashlib
+import tempfile
+from functools import lru_cache
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 
 logger = logging.getLogger(__name__)
 
+
+def _json_default(obj):
+    """Fallback for types orjson does not serialize natively (mirrors DjangoJSONEncoder)."""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_response(payload, status=200):
+    """JsonResponse replacement for large report payloads, serialized with orjson."""
+    return HttpResponse(
+        orjson.dumps(
+            payload,
+            default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        ),
+        content_type='application/json',
+        status=status,
+    )
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _xlsx_streaming_response(filename, write_workbook):
+    """Stream an Excel file in chunks instead of buffering it in the response.
+
+    ``write_workbook(fp)`` writes the workbook to a spooled temporary file
+    (kept in memory up to 8 MB, then on disk) when the response is consumed.
+    """
+    def stream():
+        with tempfile.SpooledTemporaryFile(max_size=8 << 20) as tmp:
+            write_workbook(tmp)
+            tmp.seek(0)
+            while chunk := tmp.read(64 * 1024):
+                yield chunk
+
+    response = StreamingHttpResponse(stream(), content_type=XLSX_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _add_report_row_styles(workbook):
+    """Register the named styles for bold and total rows in the formatted exports.
+
+    Cells then take a style by name in one assignment instead of separate
+    font and fill assignments.
+    """
+    bold_font = openpyxl.styles.Font(bold=True)
+    total_fill = openpyxl.styles.PatternFill(start_color='E8F4FD', end_color='E8F4FD', fill_type='solid')
+    workbook.add_named_style(openpyxl.styles.NamedStyle(name='report_bold', font=bold_font))
+    workbook.add_named_style(openpyxl.styles.NamedStyle(name='report_total', font=bold_font, fill=total_fill))
+
+
+_EMPTY_XLSX_CACHE = {}
+
+
+def _empty_xlsx_response(filename, sheet_name, message):
+    """Excel response with a single message cell, for exports with nothing to show.
+
+    The workbook bytes depend only on the sheet name and message, so they are
+    built once per process and reused.
+    """
+    key = (sheet_name, message)
+    content = _EMPTY_XLSX_CACHE.get(key)
+    if content is None:
+        buffer = io.BytesIO()
+        pd.DataFrame([[message]], columns=[sheet_name]).to_excel(
+            buffer, sheet_name=sheet_name, index=False, engine='openpyxl'
+        )
+        content = _EMPTY_XLSX_CACHE[key] = buffer.getvalue()
+    response = HttpResponse(content, content_type=XLSX_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 def clean_number_value(value):
     """Clean and parse number values from Excel, handling various formats including QuickBooks."""
     if value is None or pd.isna(value):
@@ -428,16 +519,15 @@ def upload_financial_data(request):
                     messages.error(request, error_msg)
                     return render(request, 'core/upload_financial_data.html', {'companies': companies})
             
-            # Check for existing data
-            existing_periods = []
-            for col, period_date in period_columns:
-                existing_data = FinancialData.objects.filter(
+            # Check for existing data: one query for all uploaded periods
+            existing_period_dates = set(
+                FinancialData.objects.filter(
                     company=company,
-                    period=period_date,
+                    period__in=[period_date for _, period_date in period_columns],
                     data_type=data_type
-                )
-                if existing_data.exists():
-                    existing_periods.append(col)
+                ).values_list('period', flat=True).distinct()
+            )
+            existing_periods = [col for col, period_date in period_columns if period_date in existing_period_dates]
             
             # If there's existing data and no confirmation, ask for confirmation
             if existing_periods and not request.POST.get('confirm_overwrite'):
@@ -464,21 +554,20 @@ def upload_financial_data(request):
             
             # Create backup before overwriting if there's existing data
             if existing_periods:
-                backup_data = []
-                for col, period_date in period_columns:
-                    if col in existing_periods:
-                        existing_records = FinancialData.objects.filter(
-                            company=company,
-                            period=period_date,
-                            data_type=data_type,
-                            account_code__in=uploaded_account_codes  # Backup только тех записей, которые будут удалены
-                        )
-                        for record in existing_records:
-                            backup_data.append({
-                                'account_code': record.account_code,
-                                'amount': float(record.amount),
-                                'period': record.period.isoformat()
-                            })
+                overwritten_records = FinancialData.objects.filter(
+                    company=company,
+                    period__in=existing_period_dates,
+                    data_type=data_type,
+                    account_code__in=uploaded_account_codes  # Backup только тех записей, которые будут удалены
+                )
+                backup_data = [
+                    {
+                        'account_code': record['account_code'],
+                        'amount': float(record['amount']),
+                        'period': record['period'].isoformat()
+                    }
+                    for record in overwritten_records.values('account_code', 'amount', 'period')
+                ]
                 
                 if backup_data:
                     DataBackup.objects.create(
@@ -497,20 +586,25 @@ def upload_financial_data(request):
                         messages.warning(request, backup_msg)
                 
                 # Delete ONLY data for account codes that are in the uploaded file
-                for col, period_date in period_columns:
-                    if col in existing_periods:
-                        FinancialData.objects.filter(
-                            company=company,
-                            period=period_date,
-                            data_type=data_type,
-                            account_code__in=uploaded_account_codes  # ВАЖНО: удаляем только эти коды
-                        ).delete()
+                overwritten_records.delete()  # ВАЖНО: удаляем только эти коды
             
             success_count = 0
             error_count = 0
             errors = []
             debug_info = []
             
+            # Chart of Accounts names for the uploaded codes, read in one query
+            # instead of a lookup per row. account_code is not unique, so codes
+            # listed more than once are tracked to reject them as before
+            chart_account_names = {}
+            duplicate_account_codes = set()
+            for code, name in ChartOfAccounts.objects.filter(
+                account_code__in=uploaded_account_codes
+            ).values_list('account_code', 'account_name'):
+                if code in chart_account_names:
+                    duplicate_account_codes.add(code)
+                chart_account_names[code] = name
+            
             for index, row in df.iterrows():
                 try:
                     account_code_raw = row.iloc[0]
@@ -530,14 +624,17 @@ def upload_financial_data(request):
                         continue
                     
                     # Verify account exists in ChartOfAccounts (ONLY by account_code)
-                    try:
-                        chart_account = ChartOfAccounts.objects.get(account_code=account_code)
-                        debug_info.append(f"  -> Found in Chart of Accounts: {chart_account.account_name}")
-                    except ChartOfAccounts.DoesNotExist:
+                    if account_code not in chart_account_names:
                         errors.append(f"Row {index + 2}: Account code '{account_code}' not found in Chart of Accounts")
                         error_count += 1
                         debug_info.append(f"  -> ERROR: Account not found")
                         continue
+                    if account_code in duplicate_account_codes:
+                        errors.append(f"Row {index + 2}: Account code '{account_code}' appears more than once in Chart of Accounts")
+                        error_count += 1
+                        debug_info.append(f"  -> ERROR: Duplicate account code")
+                        continue
+                    debug_info.append(f"  -> Found in Chart of Accounts: {chart_account_names[account_code]}")
                     
                     # Process each period column
                     for col, period_date in period_columns:
@@ -648,9 +745,228 @@ def download_template(request):
     
     return response
 
-@login_required
-def pl_report_data(request):
-    """P&L Report data in JSON format for AG Grid, с нормализацией месяцев и фильтром по диапазону."""
+PL_COA_CACHE_TIMEOUT = 3600
+
+
+def _pl_coa_bundle():
+    """Return the P&L chart-of-accounts metadata, cached per COA version.
+
+    The version is MAX(updated_at) plus the row count, so edits, uploads and
+    deletions all produce a new cache key.
+    """
+    version = ChartOfAccounts.objects.filter(
+        account_type__in=['INCOME', 'EXPENSE']
+    ).aggregate(last_updated=Max('updated_at'), total=Count('id'))
+    last_updated = version['last_updated'].isoformat() if version['last_updated'] else 'none'
+    version_token = f"{last_updated}:{version['total']}"
+    cache_key = f"pl_coa:v2:{version_token}"
+    bundle = cache.get(cache_key)
+    if bundle is not None:
+        return bundle
+
+    chart_accounts_all = list(ChartOfAccounts.objects.filter(
+        account_type__in=['INCOME', 'EXPENSE']
+    ).order_by('sort_order'))
+    chart_accounts = [a for a in chart_accounts_all if (a.account_code or '').strip()]
+    pl_account_codes = [a.account_code for a in chart_accounts if a.account_code]
+    pl_account_code_set = set(pl_account_codes)
+
+    # Группировка COA по sub_category для структуры
+    grouped_data = {}
+    for acc in chart_accounts_all:
+        grouped_data.setdefault(acc.sub_category or 'UNCATEGORIZED', []).append(acc)
+
+    # Min sort_order per sub_category (ordering) and per (sub_category, account_type) (sub headers)
+    sub_category_sort = {}
+    sub_category_type_sort = {}
+    for acc in chart_accounts_all:
+        if acc.sub_category is None:
+            continue
+        sub_category_sort[acc.sub_category] = min(sub_category_sort.get(acc.sub_category, acc.sort_order), acc.sort_order)
+        key = (acc.sub_category, acc.account_type)
+        sub_category_type_sort[key] = min(sub_category_type_sort.get(key, acc.sort_order), acc.sort_order)
+
+    correct_order = sorted(sub_category_sort, key=sub_category_sort.get)
+    pl_structure = [c for c in correct_order if c in grouped_data] + [c for c in grouped_data if c not in sub_category_sort]
+
+    bundle = {
+        'chart_accounts_all': chart_accounts_all,
+        'chart_accounts': chart_accounts,
+        'pl_account_codes': pl_account_codes,
+        'grouped_data': grouped_data,
+        'pl_structure': pl_structure,
+        'sub_category_type_sort': sub_category_type_sort,
+        'income_count': sum(1 for a in chart_accounts_all if a.account_type == 'INCOME' and a.account_code in pl_account_code_set),
+        'expense_count': sum(1 for a in chart_accounts_all if a.account_type == 'EXPENSE' and a.account_code in pl_account_code_set),
+        'version': version_token,
+    }
+    cache.set(cache_key, bundle, PL_COA_CACHE_TIMEOUT)
+    return bundle
+
+
+PL_REPORT_CACHE_TIMEOUT = 3600
+BS_REPORT_CACHE_TIMEOUT = 3600
+
+# ChartOfAccounts.account_type values shown on the Balance Sheet (matched case-insensitively)
+BS_ACCOUNT_TYPES = (
+    'ASSET', 'LIABILITY', 'EQUITY',
+    'Bank', 'Fixed Asset', 'Other Current Asset', 'Other Asset',
+    'Other Current Liabilities', 'Other Current Liability',
+    'Equity',
+)
+
+
+def _report_data_version(windows, models=(FinancialData, CFDashboardData, CFDashboardBudget)):
+    """Change token for the period-based report inputs inside the given windows.
+
+    ``windows`` is a list of ``(start, end_exclusive)`` pairs (either bound may
+    be None). For each of ``models`` the token combines the row count and
+    MAX(updated_at) of the rows in those windows, so uploads, edits and
+    deletions all change it.
+    """
+    period_q = Q()
+    for window_start, window_end in windows:
+        if not window_start and not window_end:
+            period_q = Q()
+            break
+        window_q = Q()
+        if window_start:
+            window_q &= Q(period__gte=window_start)
+        if window_end:
+            window_q &= Q(period__lt=window_end)
+        period_q |= window_q
+
+    parts = []
+    for model in models:
+        version = model.objects.filter(period_q).aggregate(last_updated=Max('updated_at'), total=Count('*'))
+        last_updated = version['last_updated'].isoformat() if version['last_updated'] else 'none'
+        parts.append(f"{last_updated}:{version['total']}")
+    return '|'.join(parts)
+
+
+def _bs_account_type_q():
+    """Case-insensitive ChartOfAccounts filter for the Balance Sheet account types."""
+    q_objects = Q()
+    for t in BS_ACCOUNT_TYPES:
+        q_objects |= Q(account_type__iexact=t)
+    return q_objects
+
+
+def _bs_report_etag(request):
+    """ETag for bs_report_data, also used as its report cache key.
+
+    Combines the request filters with the company list, the Balance Sheet COA
+    version and the FinancialData version of the selected window. Stored on
+    the request so condition() and the view compute it only once.
+    """
+    etag = getattr(request, '_bs_report_etag', None)
+    if etag is not None:
+        return etag
+
+    params = tuple(
+        request.GET.get(name, '')
+        for name in ('from_month', 'from_year', 'to_month', 'to_year', 'data_type', 'companies')
+    )
+    from_date_start, _ = convert_month_year_to_date_range(params[0], params[1])
+    _, to_date_end = convert_month_year_to_date_range(params[2], params[3])
+    data_window_end = to_date_end + relativedelta(days=1) if to_date_end else None
+
+    coa_version = ChartOfAccounts.objects.filter(_bs_account_type_q()).aggregate(
+        last_updated=Max('updated_at'), total=Count('id')
+    )
+    signature = (
+        params,
+        tuple(Company.objects.filter(is_budget_only=False).order_by('name').values_list('id', 'code', 'name')),
+        coa_version['last_updated'].isoformat() if coa_version['last_updated'] else 'none',
+        coa_version['total'],
+        _report_data_version([(from_date_start, data_window_end)], models=(FinancialData,)),
+    )
+    etag = hashlib.sha1(repr(signature).encode()).hexdigest()
+    request._bs_report_etag = etag
+    return etag
+
+
+def _pl_comment_summary(row_data, column_defs):
+    """Comment counters per visible cell, keyed 'row_key||column_key'."""
+    comment_summary = {}
+    row_keys_for_comments = {row.get('rowKey') for row in row_data if row.get('rowKey')}
+    if not row_keys_for_comments:
+        return comment_summary
+    column_fields = [col.get('field') for col in column_defs if isinstance(col.get('field'), str)]
+    if column_fields:
+        comment_qs = PLComment.objects.filter(row_key__in=row_keys_for_comments, column_key__in=column_fields)
+    else:
+        comment_qs = PLComment.objects.filter(row_key__in=row_keys_for_comments)
+
+    # Only the four summary columns are needed; no join on created_by
+    for comment in comment_qs.values('row_key', 'column_key', 'resolved', 'updated_at'):
+        key = f"{comment['row_key']}||{comment['column_key']}"
+        entry = comment_summary.setdefault(key, {
+            'total': 0,
+            'open': 0,
+            'latest': None,
+        })
+        entry['total'] += 1
+        if not comment['resolved']:
+            entry['open'] += 1
+        updated_iso = comment['updated_at'].isoformat()
+        if not entry['latest'] or updated_iso > entry['latest']:
+            entry['latest'] = updated_iso
+    return comment_summary
+
+
+# Row labels repeat across rows and requests; slugify is regex + unicode work, so memoize it
+_slug = lru_cache(maxsize=1024)(slugify)
+
+
+@lru_cache(maxsize=1024)
+def build_style_token(source_text, fallback=''):
+    base = source_text or fallback or ''
+    return _slug(base) if base else ''
+
+
+# Every numeric P&L column shares width/type and one right-aligned cellStyle per colour
+_NUMBER_COL_BASE = {'width': 120, 'type': 'numberColumnWithCommas'}
+_CELL_STYLE_CACHE = {}
+
+
+def _number_col(field, header_name, col_type, background, **extra):
+    """Numeric AG Grid column def; cellStyle dicts are shared, so callers must not mutate them."""
+    cell_style = _CELL_STYLE_CACHE.get(background)
+    if cell_style is None:
+        cell_style = _CELL_STYLE_CACHE.setdefault(background, {'textAlign': 'right', 'backgroundColor': background})
+    return {
+        **_NUMBER_COL_BASE,
+        'field': field,
+        'headerName': header_name,
+        'colType': col_type,
+        'cellStyle': cell_style,
+        **extra,
+    }
+
+
+def _aggregate_account_groups(amounts, account_index, groups):
+    """Sum a period x company x account matrix over many account groups at once.
+
+    ``groups`` maps a key to a list of account codes; the result maps the same
+    keys to period x company matrices. All groups are reduced by a single
+    tensordot against an account x group membership matrix.
+    """
+    keys = list(groups)
+    membership = np.zeros((amounts.shape[2], len(keys)))
+    for gi, key in enumerate(keys):
+        for code in groups[key]:
+            membership[account_index[code], gi] += 1
+    totals = np.tensordot(amounts, membership, axes=([2], [0]))
+    return {key: totals[:, :, gi] for gi, key in enumerate(keys)}
+
+
+def _pl_report_payload(request, comment_summary=True):
+    """P&L Report data for AG Grid as a dict, с нормализацией месяцев и фильтром по диапазону.
+
+    Shared by pl_report_data and the Excel exports; the exports skip the
+    comment counters (``comment_summary=False``).
+    """
     from django.conf import settings
 
     # Get feature flag status
@@ -662,6 +978,10 @@ def pl_report_data(request):
     data_type_raw = request.GET.get('data_type', 'actual')
     # Normalize to match database: actual->Actual, budget->Budget
     data_type = data_type_raw.capitalize() if data_type_raw else 'Actual'
+    # Evaluated once; checked per period, row and cell below
+    is_budget_view = data_type.lower() in ('budget', 'forecast')
+    pl_budget_parallel = is_enabled('PL_BUDGET_PARALLEL')
+    show_budget_column = pl_budget_parallel and is_budget_view
     
     # New parameters for Display Mode and YTD
     display_mode = request.GET.get('display_mode', 'grand_total')  # 'grand_total' or 'ytd'
@@ -708,26 +1028,53 @@ def pl_report_data(request):
     # Компании
     companies = list(Company.objects.all().order_by('name'))
     # For Budget/Forecast show ALL companies including budget-only, for Actual exclude budget-only
-    if data_type and data_type.lower() in ['budget', 'forecast']:
+    if is_budget_view:
         display_companies = [c for c in companies if not getattr(c, 'is_budget_only', False)]
     else:
         display_companies = [c for c in companies if not getattr(c, 'is_budget_only', False)]
-    display_company_codes = {c.code for c in display_companies}
+    display_company_codes = frozenset(c.code for c in display_companies)
     logger.info(f"Found {len(companies)} companies.")
 
     # ВАЖНОЕ ИЗМЕНЕНИЕ: Фильтруем только P&L счета (INCOME и EXPENSE)
-    chart_accounts_all = list(ChartOfAccounts.objects.filter(
-        account_type__in=['INCOME', 'EXPENSE']
-    ).order_by('sort_order'))
-    chart_accounts = [a for a in chart_accounts_all if (a.account_code or '').strip()]
+    coa_bundle = _pl_coa_bundle()
+    chart_accounts_all = coa_bundle['chart_accounts_all']
+    chart_accounts = coa_bundle['chart_accounts']
     logger.info(f"P&L ChartOfAccounts: total={len(chart_accounts_all)}, with_code={len(chart_accounts)}")
     
     # Получаем список всех P&L account_codes для фильтрации
-    pl_account_codes = [a.account_code for a in chart_accounts if a.account_code]
+    pl_account_codes = coa_bundle['pl_account_codes']
+
+    cf_metrics = list(CFDashboardMetric.objects.filter(is_active=True).order_by('display_order'))
+
+    # Whole-report cache: the grid is deterministic in the filters, feature flags,
+    # company/COA/CF-metric setup and the data stored in the periods it reads.
+    # Comment counters change independently and are recomputed on every request.
+    data_windows = [(start, end_exclusive)]
+    if display_mode == 'ytd':
+        for ytd_year in (to_year, ytd_compare_year):
+            if ytd_year:
+                data_windows.append(get_ytd_range(to_month, ytd_year))
+    report_signature = (
+        from_month, from_year, to_month, to_year, data_type, display_mode, ytd_compare_year,
+        tuple(selected_company_codes),
+        salary_module_enabled,
+        salary_module_enabled and request.user.has_perm('core.view_salary_details'),
+        pl_budget_parallel,
+        tuple((c.id, c.code, c.name, c.is_budget_only) for c in companies),
+        tuple((m.id, m.metric_name) for m in cf_metrics),
+        coa_bundle['version'],
+        _report_data_version(data_windows),
+    )
+    report_cache_key = f"pl_report:v1:{hashlib.sha1(repr(report_signature).encode()).hexdigest()}"
+    cached_payload = cache.get(report_cache_key)
+    if cached_payload is not None:
+        if comment_summary:
+            cached_payload['commentSummary'] = _pl_comment_summary(cached_payload['rowData'], cached_payload['columnDefs'])
+        return cached_payload
 
     # Периоды: берём только там, где реально есть P&L данные
     try:
-        if is_enabled('PL_BUDGET_PARALLEL'):
+        if pl_budget_parallel:
             # Define company sets for dual streams
             actual_companies = [c for c in companies if not getattr(c, 'is_budget_only', False)]
             budget_company = next((c for c in companies if getattr(c, 'is_budget_only', False)), None)
@@ -786,7 +1133,7 @@ def pl_report_data(request):
                 if all_pl_periods:
                     suggested_start = all_pl_periods[0].strftime('%B %Y')
                     suggested_end = all_pl_periods[-1].strftime('%B %Y')
-                    return JsonResponse({
+                    return {
                         'columnDefs': [],
                         'rowData': [],
                         'error': f'No P&L data found for selected period. P&L data is available from {suggested_start} to {suggested_end}',
@@ -794,70 +1141,104 @@ def pl_report_data(request):
                             'start': all_pl_periods[0].strftime('%Y-%m-%d'),
                             'end': all_pl_periods[-1].strftime('%Y-%m-%d')
                         }
-                    })
+                    }
     except Exception as e:
         logger.error(f"Error fetching periods: {e}")
         periods = []
 
     if not periods:
         logger.warning("No P&L periods found, returning empty data.")
-        return JsonResponse({
+        return {
             'columnDefs': [],
             'rowData': [],
             'error': 'No P&L data found. Please check if Income and Expense accounts are properly loaded.'
-        })
+        }
+
+    # Column labels per period, formatted once: 'Jan-25' for field names, '2025-01' for visibility keys
+    period_labels = {p: p.strftime('%b-%y') for p in periods}
+    period_keys = {p: p.strftime('%Y-%m') for p in periods}
 
     # Загружаем только P&L данные за выбранные периоды и компании
-    if is_enabled('PL_BUDGET_PARALLEL'):
+    # Rows are streamed as plain values straight into the pivot
+    # (period -> company_code -> account_code -> amount) instead of
+    # materializing a model instance (plus its Company) per row.
+    company_by_id = {c.id: c for c in companies}
+    loaded_pivot = {}
+    loaded_non_zero = set()  # (period, company_code) pairs with a non-zero amount
+    record_counts = Counter()
+    sample_record = None
+    financial_data_count = 0
+
+    def stream_pl_values(queryset):
+        nonlocal sample_record, financial_data_count
+        for row in queryset.values('period', 'company_id', 'account_code', 'amount').iterator(chunk_size=2000):
+            if sample_record is None:
+                sample_record = row
+            record_counts[row['company_id']] += 1
+            financial_data_count += 1
+            yield row
+
+    if pl_budget_parallel:
         # Actual companies (non-budget-only) for actual stream
         actual_companies = [c for c in companies if not getattr(c, 'is_budget_only', False)]
         budget_company = next((c for c in companies if getattr(c, 'is_budget_only', False)), None)
 
-        actual_financial_data = list(
+        # Both streams come back from a single query: actual rows for the
+        # regular companies OR budget/forecast rows for the budget-only company
+        stream_filter = Q(data_type='Actual', company_id__in=[c.id for c in actual_companies])
+        if budget_company:
+            stream_filter |= Q(data_type=data_type, company_id=budget_company.id)  # respect current filter (budget/forecast)
+        budget_company_id = budget_company.id if budget_company else None
+
+        combined_rows = stream_pl_values(
             FinancialData.objects.filter(
-                data_type='Actual',
+                stream_filter,
                 period__in=periods,
-                company__in=actual_companies,
                 account_code__in=pl_account_codes
-            ).select_related('company')
-        )
-
-        budget_financial_data = []
-        if budget_company:
-            budget_financial_data = list(
-                FinancialData.objects.filter(
-                    data_type=data_type,  # respect current filter (budget/forecast)
-                    period__in=periods,
-                    company=budget_company,
-                    account_code__in=pl_account_codes
-                ).select_related('company')
             )
+        )
+        budget_count = 0
+        for row in combined_rows:
+            if row['company_id'] == budget_company_id:
+                # Build budget-only mapping per period/account (do not mix into financial_data)
+                period_budget = budget_values.setdefault(row['period'], {})
+                # Sum if multiple entries per period/account
+                period_budget[row['account_code']] = period_budget.get(row['account_code'], 0.0) + float(row['amount'] or 0)
+                budget_count += 1
+            else:
+                ccode = company_by_id[row['company_id']].code
+                loaded_pivot.setdefault(row['period'], {}).setdefault(ccode, {})[row['account_code']] = row['amount']
+                if row['amount']:
+                    loaded_non_zero.add((row['period'], ccode))
+        actual_count = financial_data_count - budget_count
 
-        all_financial_data = actual_financial_data + budget_financial_data
-        logger.info(f"Dual-stream loaded records: actual={len(actual_financial_data)}, budget={len(budget_financial_data)}")
+        logger.info(f"Dual-stream loaded records: actual={actual_count}, budget={budget_count}")
     else:
-        all_financial_data = list(
+        all_rows = stream_pl_values(
             FinancialData.objects.filter(
                 data_type=data_type,
                 period__in=periods,
                 company_id__in=[c.id for c in companies],
                 account_code__in=pl_account_codes  # Только P&L счета
-            ).select_related('company')
+            )
         )
-    logger.info(f"Found {len(all_financial_data)} P&L financial data records.")
+        for row in all_rows:
+            ccode = company_by_id[row['company_id']].code
+            loaded_pivot.setdefault(row['period'], {}).setdefault(ccode, {})[row['account_code']] = row['amount']
+            if row['amount']:
+                loaded_non_zero.add((row['period'], ccode))
+    logger.info(f"Found {financial_data_count} P&L financial data records.")
     
     # Добавляем детальное отладочное логирование
-    if all_financial_data:
-        sample = all_financial_data[0]
-        logger.info(f"Sample record: company={sample.company.code} (id={sample.company.id}), account={sample.account_code}, amount={sample.amount}, period={sample.period}")
+    if sample_record:
+        logger.info(f"Sample record: company={company_by_id[sample_record['company_id']].code} (id={sample_record['company_id']}), account={sample_record['account_code']}, amount={sample_record['amount']}, period={sample_record['period']}")
     
     # Проверяем данные по компаниям
     for c in companies:
-        company_data_count = len([fd for fd in all_financial_data if fd.company.id == c.id])
-        logger.info(f"Company {c.code} (id={c.id}): {company_data_count} records")
+        logger.info(f"Company {c.code} (id={c.id}): {record_counts[c.id]} records")
     
     # Получаем список компаний которые реально имеют данные
-    companies_with_data = list(set(fd.company for fd in all_financial_data))
+    companies_with_data = [c for c in companies if record_counts[c.id]]
     if not companies_with_data:
         logger.warning("No companies with data found, using all companies as fallback")
         companies_with_data = companies
@@ -866,7 +1247,7 @@ def pl_report_data(request):
 
     # Parallel logic: choose P&L companies for calculations (exclude budget-only)
     pl_companies = companies_with_data
-    if is_enabled('PL_BUDGET_PARALLEL'):
+    if pl_budget_parallel:
         pl_companies = [c for c in companies if not getattr(c, 'is_budget_only', False)]
         logger.info(f"PL companies for P&L calculations: {[c.code for c in pl_companies]}")
     
@@ -879,7 +1260,7 @@ def pl_report_data(request):
     display_companies = pl_companies
     
     # Include budget-only company for structure initialization (if using parallel budget feature)
-    if is_enabled('PL_BUDGET_PARALLEL'):
+    if pl_budget_parallel:
         budget_company = next((c for c in companies if getattr(c, 'is_budget_only', False)), None)
         all_report_companies = pl_companies + ([budget_company] if budget_company else [])
     else:
@@ -904,34 +1285,30 @@ def pl_report_data(request):
                 ).values_list('period', flat=True).distinct().order_by('period')
             )
             
-            # Load YTD data for current year
+            # Load YTD data for current year as plain (company_id, account_code, amount) tuples
             ytd_records_current = list(
                 FinancialData.objects.filter(
                     data_type=data_type,
                     period__in=ytd_periods_current,
                     company_id__in=[c.id for c in pl_companies],
                     account_code__in=pl_account_codes
-                ).select_related('company')
+                ).values_list('company_id', 'account_code', 'amount')
             )
             
             # Structure: company_code -> account_code -> total_amount
             for c in pl_companies:
-                ytd_data_current[c.code] = {}
-                for acc in pl_account_codes:
-                    ytd_data_current[c.code][acc] = Decimal('0')
+                ytd_data_current[c.code] = dict.fromkeys(pl_account_codes, 0.0)
             
             # Accumulate YTD amounts
-            for fd in ytd_records_current:
-                ccode = fd.company.code
-                acc = fd.account_code
-                if ccode in ytd_data_current and acc:
-                    ytd_data_current[ccode][acc] += (fd.amount or Decimal('0'))
+            for company_id, acc, amount in ytd_records_current:
+                if acc:
+                    ytd_data_current[company_by_id[company_id].code][acc] += float(amount or 0)
             
             logger.info(f"YTD current year ({to_year}): loaded {len(ytd_records_current)} records, {len(ytd_periods_current)} periods")
             # Debug: show sample data
             if ytd_records_current:
-                sample = ytd_records_current[0]
-                logger.info(f"YTD current sample: company={sample.company.code}, account={sample.account_code}, amount={sample.amount}")
+                sample_company_id, sample_account, sample_amount = ytd_records_current[0]
+                logger.info(f"YTD current sample: company={company_by_id[sample_company_id].code}, account={sample_account}, amount={sample_amount}")
         
         # Get YTD periods for comparison year (if selected)
         if ytd_compare_year:
@@ -946,136 +1323,107 @@ def pl_report_data(request):
                     ).values_list('period', flat=True).distinct().order_by('period')
                 )
                 
-                # Load YTD data for comparison year
+                # Load YTD data for comparison year as plain (company_id, account_code, amount) tuples
                 ytd_records_compare = list(
                     FinancialData.objects.filter(
                         data_type=data_type,
                         period__in=ytd_periods_compare,
                         company_id__in=[c.id for c in pl_companies],
                         account_code__in=pl_account_codes
-                    ).select_related('company')
+                    ).values_list('company_id', 'account_code', 'amount')
                 )
                 
                 # Structure: company_code -> account_code -> total_amount
                 for c in pl_companies:
-                    ytd_data_compare[c.code] = {}
-                    for acc in pl_account_codes:
-                        ytd_data_compare[c.code][acc] = Decimal('0')
+                    ytd_data_compare[c.code] = dict.fromkeys(pl_account_codes, 0.0)
                 
                 # Accumulate YTD amounts
-                for fd in ytd_records_compare:
-                    ccode = fd.company.code
-                    acc = fd.account_code
-                    if ccode in ytd_data_compare and acc:
-                        ytd_data_compare[ccode][acc] += (fd.amount or Decimal('0'))
+                for company_id, acc, amount in ytd_records_compare:
+                    if acc:
+                        ytd_data_compare[company_by_id[company_id].code][acc] += float(amount or 0)
                 
                 logger.info(f"YTD compare year ({ytd_compare_year}): loaded {len(ytd_records_compare)} records, {len(ytd_periods_compare)} periods")
                 # Debug: show counts by account type
-                income_codes = [a.account_code for a in chart_accounts if a.account_type == 'INCOME']
-                expense_codes = [a.account_code for a in chart_accounts if a.account_type == 'EXPENSE']
-                income_records = [r for r in ytd_records_compare if r.account_code in income_codes]
-                expense_records = [r for r in ytd_records_compare if r.account_code in expense_codes]
-                logger.info(f"YTD compare: Income records={len(income_records)}, Expense records={len(expense_records)}")
-    
-    # Индексация: period -> company_code -> account_code -> amount
-    financial_data = {}
+                account_type_by_code = {a.account_code: a.account_type for a in chart_accounts}
+                type_counts = Counter(account_type_by_code.get(acc) for _, acc, _ in ytd_records_compare)
+                logger.info(f"YTD compare: Income records={type_counts['INCOME']}, Expense records={type_counts['EXPENSE']}")
+    
     # Define a soft, readable palette (no reds) and map companies deterministically
     palette = ['#E6F3FF', '#E8F5E9', '#F0F4FF', '#E6F7F7', '#F6F8E7', '#F0E6FF', '#F5F5F5']
     color_by_company = {c.id: palette[i % len(palette)] for i, c in enumerate(display_companies)}
+    # Resolved once per company for the period x company and grand-total columns
+    company_color = {c.code: color_by_company.get(c.id, '#F5F5F5') for c in companies}
 
-    for p in periods:
-        financial_data[p] = {}
-        if is_enabled('PL_BUDGET_PARALLEL'):
-            # Initialize keys for both actual companies and budget-only company
-            for c in all_report_companies:
-                financial_data[p][c.code] = {}
-        else:
-            for c in pl_companies:  # Используем компании для P&L расчета
-                financial_data[p][c.code] = {}
-    
-    # Заполняем financial_data с проверками (dual streams under feature flag)
-    if is_enabled('PL_BUDGET_PARALLEL'):
-        # Populate actual stream into financial_data
-        for fd in actual_financial_data:
-            p = fd.period
-            ccode = fd.company.code
-            logger.debug(f"Actual stream: period={p}, company={ccode}, account={fd.account_code}, amount={fd.amount}")
-            # Fallback protection for missing keys
-            if p not in financial_data:
-                financial_data[p] = {}
-            if ccode not in financial_data[p]:
-                financial_data[p][ccode] = {}
-            financial_data[p][ccode][fd.account_code] = fd.amount
-
-        # Build budget-only mapping per period/account (do not mix into financial_data)
-        for fd in budget_financial_data:
-            p = fd.period
-            acc = fd.account_code
-            budget_values.setdefault(p, {})
-            # Sum if multiple entries per period/account
-            prev = budget_values[p].get(acc, 0)
-            budget_values[p][acc] = prev + (fd.amount or 0)
-            # print(f"DEBUG: Added to budget_values - period: {p}, account: {acc}, amount: {fd.amount}")  # debug
-        
-        # Debug: Show what's in budget_values
-        # print(f"DEBUG BUDGET_VALUES: Total periods with budget data: {len(budget_values)}")
-        for period, accounts in budget_values.items():
-            # print(f"DEBUG BUDGET_VALUES: Period {period}: {len(accounts)} accounts")
-            for acc, amount in accounts.items():
-                # print(f"DEBUG BUDGET_VALUES:   {acc}: {amount}")
-                pass  # Ensure loop has a body to avoid IndentationError
+    if pl_budget_parallel:
+        # Initialize keys for both actual companies and budget-only company
+        pivot_companies = all_report_companies
     else:
-        for fd in all_financial_data:
-            p = fd.period
-            ccode = fd.company.code
-            logger.debug(f"Processing: period={p}, company={ccode}, account={fd.account_code}, amount={fd.amount}")
-            if p in financial_data and ccode in financial_data[p]:
-                financial_data[p][ccode][fd.account_code] = fd.amount
-            else:
-                logger.warning(f"Failed to add: period={p}, company={ccode} not found in financial_data structure")
-    
-    # Track which company-period columns actually carry data
-    non_zero_company_periods = set()
-    for period, company_map in financial_data.items():
-        period_key = period.strftime('%Y-%m')
-        for company_code, accounts_map in company_map.items():
-            if company_code not in display_company_codes:
+        pivot_companies = pl_companies  # Используем компании для P&L расчета
+
+    # Индексация: матрица period × company × account для векторных итогов
+    period_index = {p: i for i, p in enumerate(periods)}
+    company_index = {c.code: i for i, c in enumerate(pl_companies)}
+    # Every coded COA account gets a slot (codes without data simply stay zero)
+    matrix_codes = list(dict.fromkeys(a.account_code for a in chart_accounts_all if a.account_code))
+    account_index = {code: i for i, code in enumerate(matrix_codes)}
+    pl_matrix = np.zeros((len(periods), len(pl_companies), len(matrix_codes)))
+    for p, company_map in loaded_pivot.items():
+        pi = period_index.get(p)
+        if pi is None:
+            continue
+        for ccode, accounts_map in company_map.items():
+            ci = company_index.get(ccode)
+            if ci is None:
                 continue
-            if any(amount for amount in accounts_map.values()):
-                non_zero_company_periods.add((period_key, company_code))
+            for code, amount in accounts_map.items():
+                ai = account_index.get(code)
+                if ai is not None and amount:
+                    pl_matrix[pi, ci, ai] = float(amount)
+
+    def sum_codes(amounts, account_codes):
+        """Sum a code -> amount map over the given accounts, skipping missing/zero entries."""
+        total = 0.0
+        for code in account_codes:
+            value = amounts.get(code)
+            if value:
+                total += value
+        return total
+
+    def fill_row_from_cells(row, cells):
+        """Write a period × company matrix into row['periods'] and row['grand_totals']."""
+        cell_values = cells.tolist()
+        period_totals = cells.sum(axis=1).tolist()
+        company_totals = cells.sum(axis=0).tolist()
+        for pi, p in enumerate(periods):
+            period_cells = row['periods'].setdefault(p, {})
+            for ci, c in enumerate(pl_companies):
+                period_cells[c.code] = cell_values[pi][ci]
+            period_cells['TOTAL'] = period_totals[pi]
+        for ci, c in enumerate(pl_companies):
+            row['grand_totals'][c.code] = company_totals[ci]
+        row['grand_totals']['TOTAL'] = float(cells.sum())
 
+    # Track which company-period columns actually carry data
+    non_zero_company_codes = display_company_codes & {c.code for c in pivot_companies}
+    non_zero_company_periods = {
+        (period_keys[period], company_code)
+        for period, company_code in loaded_non_zero
+        if company_code in non_zero_company_codes
+    }
 
-    # Группировка COA по sub_category для структуры
-    grouped_data = {}
-    for acc in chart_accounts_all:
-        sub_category = acc.sub_category or 'UNCATEGORIZED'
-        grouped_data.setdefault(sub_category, []).append(acc)
-
-    # Get P&L subcategories ordered by sort_order from database
-    pl_subcategories = ChartOfAccounts.objects.filter(
-        account_type__in=['INCOME', 'EXPENSE'],
-        sub_category__isnull=False
-    ).values('sub_category').annotate(
-        min_sort_order=Min('sort_order')
-    ).order_by('min_sort_order')
-
-    # Build the ordered list of subcategories
-    correct_order = [item['sub_category'] for item in pl_subcategories]
-    all_sub = list(grouped_data.keys())
-    pl_structure = [c for c in correct_order if c in all_sub] + [c for c in all_sub if c not in correct_order]
+
+    # Группировка COA по sub_category и порядок подкатегорий (из кэша COA)
+    grouped_data = coa_bundle['grouped_data']
+    pl_structure = coa_bundle['pl_structure']
     logger.info(f"Ordered P&L sub categories: {pl_structure}")
 
     # Сборка отчета
-    def build_style_token(source_text, fallback=''):
-        base = source_text or fallback or ''
-        return slugify(base) if base else ''
-
     report_data = []
     debug_info = {
         'periods_count': len(periods),
         'companies_count': len(companies),
         'pl_accounts_count': len(chart_accounts),
-        'financial_data_count': len(all_financial_data),
+        'financial_data_count': financial_data_count,
         'periods': [p.strftime('%Y-%m-%d') for p in periods[:6]],
         'companies': [c.code for c in companies],
         'companies_with_data': [c.code for c in companies_with_data],
@@ -1083,23 +1431,34 @@ def pl_report_data(request):
     }
     
     # Добавляем счетчики по типам
-    income_count = ChartOfAccounts.objects.filter(account_type='INCOME', account_code__in=pl_account_codes).count()
-    expense_count = ChartOfAccounts.objects.filter(account_type='EXPENSE', account_code__in=pl_account_codes).count()
-    debug_info['income_accounts'] = income_count
-    debug_info['expense_accounts'] = expense_count
+    debug_info['income_accounts'] = coa_bundle['income_count']
+    debug_info['expense_accounts'] = coa_bundle['expense_count']
     
-    if all_financial_data:
+    if sample_record:
         debug_info['sample_financial_data'] = [{
-            'company': all_financial_data[0].company.code,
-            'account': all_financial_data[0].account_code,
-            'period': str(all_financial_data[0].period),
-            'amount': float(all_financial_data[0].amount)
+            'company': company_by_id[sample_record['company_id']].code,
+            'account': sample_record['account_code'],
+            'period': str(sample_record['period']),
+            'amount': float(sample_record['amount'])
         }]
 
     # (Removed visual REVENUE section header to simplify layout)
     
+    # Все группы счетов (подкатегории и итоги секций) сворачиваются одним вызовом
+    account_groups = {
+        section: [a.account_code for a in chart_accounts if a.account_type == section]
+        for section in ('INCOME', 'EXPENSE')
+    }
+    for sub_category in pl_structure:
+        for section in ('INCOME', 'EXPENSE'):
+            group_codes = [a.account_code for a in grouped_data.get(sub_category, []) if a.account_type == section and a.account_code]
+            if group_codes:
+                account_groups[(section, sub_category)] = group_codes
+    group_cells = _aggregate_account_groups(pl_matrix, account_index, account_groups)
+
     # Обрабатываем Income счета
     income_accounts = [a for a in chart_accounts if a.account_type == 'INCOME']
+    income_codes = [a.account_code for a in income_accounts]
     total_revenue_snapshot = None
     gross_profit_inserted = False
     for sub_category in pl_structure:
@@ -1110,15 +1469,13 @@ def pl_report_data(request):
         category_accounts = [a for a in grouped_data[sub_category] if a.account_type == 'INCOME' and a.account_code]
         if not category_accounts:
             continue
+        category_codes = [a.account_code for a in category_accounts]
 
         normalized_sub_category = (sub_category or '').strip().upper()
 
         # Подзаголовок
         # Get sort_order for this subcategory
-        subcategory_sort_order = ChartOfAccounts.objects.filter(
-            sub_category=sub_category,
-            account_type='INCOME'
-        ).aggregate(min_sort=Min('sort_order'))['min_sort'] or 0
+        subcategory_sort_order = coa_bundle['sub_category_type_sort'].get((sub_category, 'INCOME')) or 0
         style_token = build_style_token(sub_category)
         
         report_data.append({
@@ -1133,6 +1490,10 @@ def pl_report_data(request):
             'styleToken': style_token
         })
 
+        # YTD субитога накапливается в том же проходе, что и строки счетов
+        sub_ytd_current = 0.0
+        sub_ytd_compare = 0.0
+
         # Счета
         for acc in category_accounts:
             row = {
@@ -1146,45 +1507,23 @@ def pl_report_data(request):
                 'level': 2,
                 'styleToken': style_token
             }
-            has_non_zero_value = False
-            # Помесячно
-            for p in periods:
-                row['periods'][p] = {}
-                period_total = Decimal('0')
-                for c in pl_companies:  # Используем отфильтрованные компании
-                    amount = financial_data[p][c.code].get(acc.account_code, Decimal('0'))
-                    row['periods'][p][c.code] = float(amount or Decimal('0'))
-                    period_total += amount or Decimal('0')
-                    if amount != 0:
-                        has_non_zero_value = True
-                row['periods'][p]['TOTAL'] = float(period_total or Decimal('0'))
-
-            # Гранд тоталы
-            for c in pl_companies:  # Используем отфильтрованные компании
-                grand_total = sum(financial_data[p][c.code].get(acc.account_code, Decimal('0')) for p in periods)
-                row['grand_totals'][c.code] = float(grand_total or Decimal('0'))
-            overall = sum(
-                sum(financial_data[p][c.code].get(acc.account_code, Decimal('0')) for c in pl_companies)
-                for p in periods
-            )
-            row['grand_totals']['TOTAL'] = float(overall or Decimal('0'))
+            account_cells = pl_matrix[:, :, account_index[acc.account_code]]
+            has_non_zero_value = bool(account_cells.any())
+            # Помесячно и гранд тоталы
+            fill_row_from_cells(row, account_cells)
             
             # YTD values (if display_mode is 'ytd')
             if display_mode == 'ytd':
                 # YTD for current year
-                ytd_total_current = Decimal('0')
-                for c in pl_companies:
-                    ytd_amount = ytd_data_current.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                    ytd_total_current += ytd_amount
+                ytd_total_current = sum(company_ytd.get(acc.account_code, 0.0) for company_ytd in ytd_data_current.values())
                 row[f'ytd_{to_year}'] = float(ytd_total_current) if ytd_total_current else None
+                sub_ytd_current += ytd_total_current
                 
                 # YTD for comparison year (if selected)
                 if ytd_compare_year:
-                    ytd_total_compare = Decimal('0')
-                    for c in pl_companies:
-                        ytd_amount = ytd_data_compare.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                        ytd_total_compare += ytd_amount
+                    ytd_total_compare = sum(company_ytd.get(acc.account_code, 0.0) for company_ytd in ytd_data_compare.values())
                     row[f'ytd_{ytd_compare_year}'] = float(ytd_total_compare) if ytd_total_compare else None
+                    sub_ytd_compare += ytd_total_compare
 
             if has_non_zero_value:
                 report_data.append(row)
@@ -1201,67 +1540,28 @@ def pl_report_data(request):
             'level': 1,
             'styleToken': style_token
         }
+        sub_cells = group_cells[('INCOME', sub_category)]
+        fill_row_from_cells(sub_total, sub_cells)
         for p in periods:
-            sub_total['periods'][p] = {}
-            period_total = Decimal('0')
-            for c in pl_companies:  # Используем отфильтрованные компании
-                company_total = sum(
-                    financial_data[p][c.code].get(a.account_code, Decimal('0'))
-                    for a in category_accounts
-                )
-                sub_total['periods'][p][c.code] = float(company_total or Decimal('0'))
-                period_total += company_total or Decimal('0')
-            sub_total['periods'][p]['TOTAL'] = float(period_total or Decimal('0'))
             # Budget subtotal per period (Budget/Forecast only)
-            if is_enabled('PL_BUDGET_PARALLEL') and data_type.lower() in ['budget', 'forecast']:
-                budget_subtotal = Decimal('0')
-                for acc in category_accounts:
-                    raw_budget = budget_values.get(p, {}).get(acc.account_code)
-                    if raw_budget is not None:
-                        try:
-                            budget_subtotal += (raw_budget if isinstance(raw_budget, Decimal) else Decimal(str(raw_budget)))
-                        except Exception:
-                            pass
+            if show_budget_column:
+                budget_subtotal = sum_codes(budget_values.get(p, {}), category_codes)
                 if budget_subtotal != 0:
-                    try:
-                        sub_total['periods'][p]['Budget'] = float(budget_subtotal)
-                    except Exception:
-                        sub_total['periods'][p]['Budget'] = None
-
-        for c in pl_companies:  # Используем отфильтрованные компании
-            gtot = sum(
-                sum(financial_data[p][c.code].get(a.account_code, Decimal('0')) for a in category_accounts)
-                for p in periods
-            )
-            sub_total['grand_totals'][c.code] = float(gtot or Decimal('0'))
-        overall = sum(
-            sum(sum(financial_data[p][c.code].get(a.account_code, Decimal('0')) for a in category_accounts) for c in pl_companies)
-            for p in periods
-        )
-        sub_total['grand_totals']['TOTAL'] = float(overall or Decimal('0'))
-        
+                    sub_total['periods'][p]['Budget'] = budget_subtotal
+
         # YTD values for subtotal (if display_mode is 'ytd')
         if display_mode == 'ytd':
             # YTD for current year
-            ytd_total_current = Decimal('0')
-            for c in pl_companies:
-                for acc in category_accounts:
-                    ytd_amount = ytd_data_current.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                    ytd_total_current += ytd_amount
-            sub_total[f'ytd_{to_year}'] = float(ytd_total_current) if ytd_total_current else None
+            sub_total[f'ytd_{to_year}'] = float(sub_ytd_current) if sub_ytd_current else None
             
             # YTD for comparison year (if selected)
             if ytd_compare_year:
-                ytd_total_compare = Decimal('0')
-                for c in pl_companies:
-                    for acc in category_accounts:
-                        ytd_amount = ytd_data_compare.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                        ytd_total_compare += ytd_amount
-                sub_total[f'ytd_{ytd_compare_year}'] = float(ytd_total_compare) if ytd_total_compare else None
+                sub_total[f'ytd_{ytd_compare_year}'] = float(sub_ytd_compare) if sub_ytd_compare else None
 
         report_data.append(sub_total)
 
     # Total Revenue
+    revenue_cells = group_cells['INCOME']
     total_revenue_row = {
         'type': 'total',
         'account_name': 'TOTAL REVENUE',
@@ -1273,70 +1573,23 @@ def pl_report_data(request):
         'sort_order': 0,
         'styleToken': build_style_token('TOTAL REVENUE')
     }
+    fill_row_from_cells(total_revenue_row, revenue_cells)
     for p in periods:
-        total_revenue_row['periods'][p] = {}
-        period_total = Decimal('0')
-        for c in pl_companies:  # Используем только компании с данными
-            company_total = sum(
-                financial_data[p][c.code].get(a.account_code, Decimal('0'))
-                for a in income_accounts
-            )
-            total_revenue_row['periods'][p][c.code] = float(company_total or Decimal('0'))
-            period_total += company_total or Decimal('0')
-        total_revenue_row['periods'][p]['TOTAL'] = float(period_total or Decimal('0'))
         # Budget total revenue by period (Budget/Forecast only)
-        if is_enabled('PL_BUDGET_PARALLEL') and data_type.lower() in ['budget', 'forecast']:
-            budget_total = Decimal('0')
-            # print(f"DEBUG TOTAL REVENUE: Calculating Budget for period {p}")
-            for a in income_accounts:
-                raw_budget = budget_values.get(p, {}).get(a.account_code)
-                if raw_budget is not None:
-                    try:
-                        budget_total += (raw_budget if isinstance(raw_budget, Decimal) else Decimal(str(raw_budget)))
-                        # print(f"DEBUG TOTAL REVENUE: Added {a.account_code} = {raw_budget}, running total = {budget_total}")
-                    except Exception:
-                        pass
-            # print(f"DEBUG TOTAL REVENUE: Final budget_total for period {p} = {budget_total}")
+        if show_budget_column:
+            budget_total = sum_codes(budget_values.get(p, {}), income_codes)
             if budget_total != 0:
-                try:
-                    total_revenue_row['periods'][p]['Budget'] = float(budget_total)
-                    # print(f"DEBUG TOTAL REVENUE: Set total_revenue_row['periods'][{p}]['Budget'] = {float(budget_total)}")
-                except Exception:
-                    total_revenue_row['periods'][p]['Budget'] = None
-                    # print(f"DEBUG TOTAL REVENUE: Set total_revenue_row['periods'][{p}]['Budget'] = None (exception)")
-            else:
-                # print(f"DEBUG TOTAL REVENUE: budget_total is 0, not setting Budget value")
-                pass
-    # Grand totals for revenue
-    for c in pl_companies:  # Используем только компании с данными
-        gtot = sum(
-            sum(financial_data[p][c.code].get(a.account_code, Decimal('0')) for a in income_accounts)
-            for p in periods
-        )
-        total_revenue_row['grand_totals'][c.code] = float(gtot or Decimal('0'))
-    overall_revenue = sum(
-        sum(sum(financial_data[p][c.code].get(a.account_code, Decimal('0')) for a in income_accounts) for c in pl_companies)
-        for p in periods
-    )
-    total_revenue_row['grand_totals']['TOTAL'] = float(overall_revenue or Decimal('0'))
+                total_revenue_row['periods'][p]['Budget'] = budget_total
     
     # YTD values for Total Revenue (if display_mode is 'ytd')
     if display_mode == 'ytd':
         # YTD for current year
-        ytd_total_current = Decimal('0')
-        for c in pl_companies:
-            for acc in income_accounts:
-                ytd_amount = ytd_data_current.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                ytd_total_current += ytd_amount
+        ytd_total_current = sum(sum_codes(company_ytd, income_codes) for company_ytd in ytd_data_current.values())
         total_revenue_row[f'ytd_{to_year}'] = float(ytd_total_current) if ytd_total_current else None
         
         # YTD for comparison year (if selected)
         if ytd_compare_year:
-            ytd_total_compare = Decimal('0')
-            for c in pl_companies:
-                for acc in income_accounts:
-                    ytd_amount = ytd_data_compare.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                    ytd_total_compare += ytd_amount
+            ytd_total_compare = sum(sum_codes(company_ytd, income_codes) for company_ytd in ytd_data_compare.values())
             total_revenue_row[f'ytd_{ytd_compare_year}'] = float(ytd_total_compare) if ytd_total_compare else None
     
     total_revenue_snapshot = copy.deepcopy(total_revenue_row)
@@ -1359,6 +1612,7 @@ def pl_report_data(request):
 
     # Обрабатываем Expense счета
     expense_accounts = [a for a in chart_accounts if a.account_type == 'EXPENSE']
+    expense_codes = [a.account_code for a in expense_accounts]
     for sub_category in pl_structure:
         if sub_category not in grouped_data:
             continue
@@ -1367,13 +1621,11 @@ def pl_report_data(request):
         category_accounts = [a for a in grouped_data[sub_category] if a.account_type == 'EXPENSE' and a.account_code]
         if not category_accounts:
             continue
+        category_codes = [a.account_code for a in category_accounts]
 
         # Подзаголовок
         # Get sort_order for this subcategory
-        subcategory_sort_order = ChartOfAccounts.objects.filter(
-            sub_category=sub_category,
-            account_type='EXPENSE'
-        ).aggregate(min_sort=Min('sort_order'))['min_sort'] or 0
+        subcategory_sort_order = coa_bundle['sub_category_type_sort'].get((sub_category, 'EXPENSE')) or 0
         style_token = build_style_token(sub_category)
         
         report_data.append({
@@ -1388,6 +1640,10 @@ def pl_report_data(request):
             'styleToken': style_token
         })
 
+        # YTD субитога накапливается в том же проходе, что и строки счетов
+        sub_ytd_current = 0.0
+        sub_ytd_compare = 0.0
+
         # Счета (аналогично Income)
         for acc in category_accounts:
             row = {
@@ -1401,46 +1657,23 @@ def pl_report_data(request):
                 'level': 2,
                 'styleToken': style_token
             }
-            has_non_zero_value = False
-            # Помесячно
-            for p in periods:
-                row['periods'][p] = {}
-                period_total = Decimal('0')
-                for c in pl_companies:
-                    # Diagnostic logging for key formats during lookup (expense section)
-                    amount = financial_data[p][c.code].get(acc.account_code, 0)
-                    row['periods'][p][c.code] = float(amount or 0)
-                    period_total += amount or 0
-                    if amount != 0:
-                        has_non_zero_value = True
-                row['periods'][p]['TOTAL'] = float(period_total or 0)
-
-            # Гранд тоталы
-            for c in pl_companies:
-                grand_total = sum(financial_data[p][c.code].get(acc.account_code, 0) for p in periods)
-                row['grand_totals'][c.code] = float(grand_total or 0)
-            overall = sum(
-                sum(financial_data[p][c.code].get(acc.account_code, 0) for c in pl_companies)
-                for p in periods
-            )
-            row['grand_totals']['TOTAL'] = float(overall or 0)
+            account_cells = pl_matrix[:, :, account_index[acc.account_code]]
+            has_non_zero_value = bool(account_cells.any())
+            # Помесячно и гранд тоталы
+            fill_row_from_cells(row, account_cells)
             
             # YTD values (if display_mode is 'ytd')
             if display_mode == 'ytd':
                 # YTD for current year
-                ytd_total_current = Decimal('0')
-                for c in pl_companies:
-                    ytd_amount = ytd_data_current.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                    ytd_total_current += ytd_amount
+                ytd_total_current = sum(company_ytd.get(acc.account_code, 0.0) for company_ytd in ytd_data_current.values())
                 row[f'ytd_{to_year}'] = float(ytd_total_current) if ytd_total_current else None
+                sub_ytd_current += ytd_total_current
                 
                 # YTD for comparison year (if selected)
                 if ytd_compare_year:
-                    ytd_total_compare = Decimal('0')
-                    for c in pl_companies:
-                        ytd_amount = ytd_data_compare.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                        ytd_total_compare += ytd_amount
+                    ytd_total_compare = sum(company_ytd.get(acc.account_code, 0.0) for company_ytd in ytd_data_compare.values())
                     row[f'ytd_{ytd_compare_year}'] = float(ytd_total_compare) if ytd_total_compare else None
+                    sub_ytd_compare += ytd_total_compare
 
             if has_non_zero_value:
                 report_data.append(row)
@@ -1457,80 +1690,30 @@ def pl_report_data(request):
             'level': 1,
             'styleToken': style_token
         }
+        sub_cells = group_cells[('EXPENSE', sub_category)]
+        fill_row_from_cells(sub_total, sub_cells)
         for p in periods:
-            sub_total['periods'][p] = {}
-            period_total = Decimal('0')
-            for c in pl_companies:
-                company_total = sum(
-                    financial_data[p][c.code].get(a.account_code, 0)
-                    for a in category_accounts
-                )
-                sub_total['periods'][p][c.code] = float(company_total or 0)
-                # Accumulate per-company totals into the per-period TOTAL
-                period_total += company_total or 0
-            # Set per-period TOTAL after summing all companies
-            sub_total['periods'][p]['TOTAL'] = float(period_total or 0)
             # Budget subtotal per period (Budget/Forecast only)
-            if is_enabled('PL_BUDGET_PARALLEL') and data_type.lower() in ['budget', 'forecast']:
-                budget_subtotal = Decimal('0')
-                # print(f"DEBUG SUBTOTAL: Calculating Budget for {sub_category}, period {p}")
-                for acc in category_accounts:
-                    raw_budget = budget_values.get(p, {}).get(acc.account_code)
-                    if raw_budget is not None:
-                        try:
-                            budget_subtotal += (raw_budget if isinstance(raw_budget, Decimal) else Decimal(str(raw_budget)))
-                            # print(f"DEBUG SUBTOTAL: Added {acc.account_code} = {raw_budget}, running total = {budget_subtotal}")
-                        except Exception:
-                            pass
-                # print(f"DEBUG SUBTOTAL: Final budget_subtotal for {sub_category}, period {p} = {budget_subtotal}")
+            if show_budget_column:
+                budget_subtotal = sum_codes(budget_values.get(p, {}), category_codes)
                 if budget_subtotal != 0:
-                    try:
-                        sub_total['periods'][p]['Budget'] = float(budget_subtotal)
-                        # print(f"DEBUG SUBTOTAL: Set sub_total['periods'][{p}]['Budget'] = {float(budget_subtotal)}")
-                    except Exception:
-                        sub_total['periods'][p]['Budget'] = None
-                        # print(f"DEBUG SUBTOTAL: Set sub_total['periods'][{p}]['Budget'] = None (exception)")
-                else:
-                    # print(f"DEBUG SUBTOTAL: budget_subtotal is 0, not setting Budget value")
-                    pass
+                    sub_total['periods'][p]['Budget'] = budget_subtotal
 
-        for c in pl_companies:
-            gtot = sum(
-                sum(financial_data[p][c.code].get(a.account_code, 0) for a in category_accounts)
-                for p in periods
-            )
-            sub_total['grand_totals'][c.code] = float(gtot or 0)
-        overall = sum(
-            sum(sum(financial_data[p][c.code].get(a.account_code, 0) for a in category_accounts) for c in pl_companies)
-            for p in periods
-        )
-        sub_total['grand_totals']['TOTAL'] = float(overall or 0)
-        
         # YTD values for subtotal (if display_mode is 'ytd')
         if display_mode == 'ytd':
             # YTD for current year
-            ytd_total_current = Decimal('0')
-            for c in pl_companies:
-                for acc in category_accounts:
-                    ytd_amount = ytd_data_current.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                    ytd_total_current += ytd_amount
-            sub_total[f'ytd_{to_year}'] = float(ytd_total_current) if ytd_total_current else None
+            sub_total[f'ytd_{to_year}'] = float(sub_ytd_current) if sub_ytd_current else None
             
             # YTD for comparison year (if selected)
             if ytd_compare_year:
-                ytd_total_compare = Decimal('0')
-                for c in pl_companies:
-                    for acc in category_accounts:
-                        ytd_amount = ytd_data_compare.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                        ytd_total_compare += ytd_amount
-                sub_total[f'ytd_{ytd_compare_year}'] = float(ytd_total_compare) if ytd_total_compare else None
-        
-        # Debug: Show what's in the subtotal row before adding to report_data
-        # print(f"DEBUG SUBTOTAL ROW: Final subtotal for '{sub_total['account_name']}':")
-        for p in periods:
-            budget_val = sub_total['periods'][p].get('Budget')
-            # print(f"DEBUG SUBTOTAL ROW:   Period {p}: Budget = {budget_val}")
+                sub_total[f'ytd_{ytd_compare_year}'] = float(sub_ytd_compare) if sub_ytd_compare else None
         
+        if show_budget_column and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"P&L subtotal '{sub_total['account_name']}' budget: "
+                f"{ {p: sub_total['periods'][p].get('Budget') for p in periods} }"
+            )
+
         report_data.append(sub_total)
 
         normalized_sub_category = (sub_category or '').strip().upper()
@@ -1539,14 +1722,6 @@ def pl_report_data(request):
             and normalized_sub_category == 'COST OF FUNDS AND FEES'
             and total_revenue_snapshot is not None
         ):
-            def to_decimal(value):
-                if value in (None, ''):
-                    return Decimal('0')
-                try:
-                    return Decimal(str(value))
-                except (InvalidOperation, TypeError):
-                    return Decimal('0')
-
             gross_profit_row = {
                 'type': 'total',
                 'account_name': 'Gross Profit',
@@ -1559,62 +1734,43 @@ def pl_report_data(request):
                 'styleToken': build_style_token('Gross Profit')
             }
 
+            fill_row_from_cells(gross_profit_row, revenue_cells - sub_cells)
             for p in periods:
-                gross_profit_row['periods'][p] = {}
-                period_total = Decimal('0')
-                for c in pl_companies:
-                    revenue_val = to_decimal(total_revenue_snapshot['periods'][p].get(c.code))
-                    cost_val = to_decimal(sub_total['periods'][p].get(c.code))
-                    gross_val = revenue_val - cost_val
-                    gross_profit_row['periods'][p][c.code] = float(gross_val)
-                    period_total += gross_val
-                gross_profit_row['periods'][p]['TOTAL'] = float(period_total)
-
-                if is_enabled('PL_BUDGET_PARALLEL') and data_type.lower() in ['budget', 'forecast']:
-                    revenue_budget = to_decimal(total_revenue_snapshot['periods'][p].get('Budget'))
-                    cost_budget = to_decimal(sub_total['periods'][p].get('Budget'))
+                if show_budget_column:
+                    revenue_budget = total_revenue_snapshot['periods'][p].get('Budget') or 0.0
+                    cost_budget = sub_total['periods'][p].get('Budget') or 0.0
                     budget_val = revenue_budget - cost_budget
-                    gross_profit_row['periods'][p]['Budget'] = float(budget_val) if budget_val != 0 else None
+                    gross_profit_row['periods'][p]['Budget'] = budget_val if budget_val != 0 else None
 
-            for c in pl_companies:
-                revenue_total = to_decimal(total_revenue_snapshot['grand_totals'].get(c.code))
-                cost_total = to_decimal(sub_total['grand_totals'].get(c.code))
-                gross_profit_row['grand_totals'][c.code] = float(revenue_total - cost_total)
-
-            overall_gross = (
-                to_decimal(total_revenue_snapshot['grand_totals'].get('TOTAL'))
-                - to_decimal(sub_total['grand_totals'].get('TOTAL'))
-            )
-            gross_profit_row['grand_totals']['TOTAL'] = float(overall_gross)
-
-            if is_enabled('PL_BUDGET_PARALLEL') and data_type.lower() in ['budget', 'forecast']:
-                revenue_budget_total = to_decimal(total_revenue_snapshot['grand_totals'].get('Budget'))
-                cost_budget_total = to_decimal(sub_total['grand_totals'].get('Budget'))
+            if show_budget_column:
+                revenue_budget_total = total_revenue_snapshot['grand_totals'].get('Budget') or 0.0
+                cost_budget_total = sub_total['grand_totals'].get('Budget') or 0.0
                 gross_budget_total = revenue_budget_total - cost_budget_total
                 gross_profit_row['grand_totals']['Budget'] = (
-                    float(gross_budget_total) if gross_budget_total != 0 else None
+                    gross_budget_total if gross_budget_total != 0 else None
                 )
             
             # YTD values for Gross Profit (if display_mode is 'ytd')
             if display_mode == 'ytd':
                 # YTD for current year: Revenue YTD - Cost YTD
-                revenue_ytd_current = to_decimal(total_revenue_snapshot.get(f'ytd_{to_year}'))
-                cost_ytd_current = to_decimal(sub_total.get(f'ytd_{to_year}'))
+                revenue_ytd_current = total_revenue_snapshot.get(f'ytd_{to_year}') or 0.0
+                cost_ytd_current = sub_total.get(f'ytd_{to_year}') or 0.0
                 gross_ytd_current = revenue_ytd_current - cost_ytd_current
-                gross_profit_row[f'ytd_{to_year}'] = float(gross_ytd_current) if gross_ytd_current != 0 else None
+                gross_profit_row[f'ytd_{to_year}'] = gross_ytd_current if gross_ytd_current != 0 else None
                 
                 # YTD for comparison year (if selected)
                 if ytd_compare_year:
-                    revenue_ytd_compare = to_decimal(total_revenue_snapshot.get(f'ytd_{ytd_compare_year}'))
-                    cost_ytd_compare = to_decimal(sub_total.get(f'ytd_{ytd_compare_year}'))
+                    revenue_ytd_compare = total_revenue_snapshot.get(f'ytd_{ytd_compare_year}') or 0.0
+                    cost_ytd_compare = sub_total.get(f'ytd_{ytd_compare_year}') or 0.0
                     gross_ytd_compare = revenue_ytd_compare - cost_ytd_compare
-                    gross_profit_row[f'ytd_{ytd_compare_year}'] = float(gross_ytd_compare) if gross_ytd_compare != 0 else None
+                    gross_profit_row[f'ytd_{ytd_compare_year}'] = gross_ytd_compare if gross_ytd_compare != 0 else None
 
             insert_index = len(report_data)
             report_data.insert(insert_index, gross_profit_row)
             gross_profit_inserted = True
 
     # Total Expenses
+    expense_cells = group_cells['EXPENSE']
     total_expense_row = {
         'type': 'total',
         'account_name': 'TOTAL EXPENSES',
@@ -1626,71 +1782,23 @@ def pl_report_data(request):
         'sort_order': 0,
         'styleToken': build_style_token('TOTAL EXPENSES')
     }
+    fill_row_from_cells(total_expense_row, expense_cells)
     for p in periods:
-        total_expense_row['periods'][p] = {}
-        period_total = Decimal('0')
-        for c in pl_companies:
-            company_total = sum(
-                financial_data[p][c.code].get(a.account_code, 0)
-                for a in expense_accounts
-            )
-            total_expense_row['periods'][p][c.code] = float(company_total or 0)
-            period_total += company_total or 0
-        total_expense_row['periods'][p]['TOTAL'] = float(period_total or 0)
         # Budget total expenses by period (Budget/Forecast only)
-        # print(f"DEBUG TOTAL EXPENSES: Feature flag check - is_enabled('PL_BUDGET_PARALLEL')={is_enabled('PL_BUDGET_PARALLEL')}, data_type='{data_type}', data_type.lower() in ['budget', 'forecast']={data_type.lower() in ['budget', 'forecast']}")
-        if is_enabled('PL_BUDGET_PARALLEL') and data_type.lower() in ['budget', 'forecast']:
-            budget_total = Decimal('0')
-            # print(f"DEBUG TOTAL EXPENSES: Calculating Budget for period {p}")
-            for a in expense_accounts:
-                raw_budget = budget_values.get(p, {}).get(a.account_code)
-                if raw_budget is not None:
-                    try:
-                        budget_total += (raw_budget if isinstance(raw_budget, Decimal) else Decimal(str(raw_budget)))
-                        # print(f"DEBUG TOTAL EXPENSES: Added {a.account_code} = {raw_budget}, running total = {budget_total}")
-                    except Exception:
-                        pass
-            # print(f"DEBUG TOTAL EXPENSES: Final budget_total for period {p} = {budget_total}")
+        if show_budget_column:
+            budget_total = sum_codes(budget_values.get(p, {}), expense_codes)
             if budget_total != 0:
-                try:
-                    total_expense_row['periods'][p]['Budget'] = float(budget_total)
-                    # print(f"DEBUG TOTAL EXPENSES: Set total_expense_row['periods'][{p}]['Budget'] = {float(budget_total)}")
-                except Exception:
-                    total_expense_row['periods'][p]['Budget'] = None
-                    # print(f"DEBUG TOTAL EXPENSES: Set total_expense_row['periods'][{p}]['Budget'] = None (exception)")
-            else:
-                # print(f"DEBUG TOTAL EXPENSES: budget_total is 0, not setting Budget value")
-                pass
-    # Grand totals for expenses
-    for c in pl_companies:
-        gtot = sum(
-            sum(financial_data[p][c.code].get(a.account_code, 0) for a in expense_accounts)
-            for p in periods
-        )
-        total_expense_row['grand_totals'][c.code] = float(gtot or 0)
-    overall_expense = sum(
-        sum(sum(financial_data[p][c.code].get(a.account_code, 0) for a in expense_accounts) for c in pl_companies)
-        for p in periods
-    )
-    total_expense_row['grand_totals']['TOTAL'] = float(overall_expense or 0)
+                total_expense_row['periods'][p]['Budget'] = budget_total
     
     # YTD values for Total Expenses (if display_mode is 'ytd')
     if display_mode == 'ytd':
         # YTD for current year
-        ytd_total_current = Decimal('0')
-        for c in pl_companies:
-            for acc in expense_accounts:
-                ytd_amount = ytd_data_current.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                ytd_total_current += ytd_amount
+        ytd_total_current = sum(sum_codes(company_ytd, expense_codes) for company_ytd in ytd_data_current.values())
         total_expense_row[f'ytd_{to_year}'] = float(ytd_total_current) if ytd_total_current else None
         
         # YTD for comparison year (if selected)
         if ytd_compare_year:
-            ytd_total_compare = Decimal('0')
-            for c in pl_companies:
-                for acc in expense_accounts:
-                    ytd_amount = ytd_data_compare.get(c.code, {}).get(acc.account_code, Decimal('0'))
-                    ytd_total_compare += ytd_amount
+            ytd_total_compare = sum(sum_codes(company_ytd, expense_codes) for company_ytd in ytd_data_compare.values())
             total_expense_row[f'ytd_{ytd_compare_year}'] = float(ytd_total_compare) if ytd_total_compare else None
     
     report_data.append(total_expense_row)
@@ -1707,18 +1815,9 @@ def pl_report_data(request):
         'sort_order': 0,
         'styleToken': build_style_token('NET INCOME')
     }
-    for p in periods:
-        net_income_row['periods'][p] = {}
-        period_total = Decimal('0')
-        for c in pl_companies:
-            revenue = Decimal(str(total_revenue_row['periods'][p][c.code]))
-            expense = Decimal(str(total_expense_row['periods'][p][c.code]))
-            net = revenue - expense
-            net_income_row['periods'][p][c.code] = float(net)
-            period_total += net
-        net_income_row['periods'][p]['TOTAL'] = float(period_total)
+    fill_row_from_cells(net_income_row, revenue_cells - expense_cells)
     # Calculate NET INCOME Budget values
-    if is_enabled('PL_BUDGET_PARALLEL') and data_type.lower() in ['budget', 'forecast']:
+    if show_budget_column:
         for p in periods:
             revenue_budget = total_revenue_row['periods'].get(p, {}).get('Budget', 0) or 0
             expense_budget = total_expense_row['periods'].get(p, {}).get('Budget', 0) or 0
@@ -1726,28 +1825,21 @@ def pl_report_data(request):
             if revenue_budget or expense_budget:
                 net_income_budget = revenue_budget - expense_budget
                 net_income_row['periods'][p]['Budget'] = net_income_budget
-                # print(f"DEBUG NET INCOME: Period {p}: Revenue {revenue_budget} - Expenses {expense_budget} = {net_income_budget}")
-    # Grand totals for net income
-    for c in pl_companies:
-        revenue = Decimal(str(total_revenue_row['grand_totals'][c.code]))
-        expense = Decimal(str(total_expense_row['grand_totals'][c.code]))
-        net_income_row['grand_totals'][c.code] = float(revenue - expense)
-    net_income_row['grand_totals']['TOTAL'] = float(Decimal(str(total_revenue_row['grand_totals']['TOTAL'])) - Decimal(str(total_expense_row['grand_totals']['TOTAL'])))
     
     # YTD values for Net Income (if display_mode is 'ytd')
     if display_mode == 'ytd':
         # YTD for current year: Revenue - Expenses
-        ytd_revenue_current = total_revenue_row.get(f'ytd_{to_year}', 0) or 0
-        ytd_expense_current = total_expense_row.get(f'ytd_{to_year}', 0) or 0
+        ytd_revenue_current = total_revenue_row.get(f'ytd_{to_year}') or 0.0
+        ytd_expense_current = total_expense_row.get(f'ytd_{to_year}') or 0.0
         net_income_ytd_current = ytd_revenue_current - ytd_expense_current
-        net_income_row[f'ytd_{to_year}'] = float(net_income_ytd_current) if net_income_ytd_current else None
+        net_income_row[f'ytd_{to_year}'] = net_income_ytd_current or None
         
         # YTD for comparison year (if selected)
         if ytd_compare_year:
-            ytd_revenue_compare = total_revenue_row.get(f'ytd_{ytd_compare_year}', 0) or 0
-            ytd_expense_compare = total_expense_row.get(f'ytd_{ytd_compare_year}', 0) or 0
+            ytd_revenue_compare = total_revenue_row.get(f'ytd_{ytd_compare_year}') or 0.0
+            ytd_expense_compare = total_expense_row.get(f'ytd_{ytd_compare_year}') or 0.0
             net_income_ytd_compare = ytd_revenue_compare - ytd_expense_compare
-            net_income_row[f'ytd_{ytd_compare_year}'] = float(net_income_ytd_compare) if net_income_ytd_compare else None
+            net_income_row[f'ytd_{ytd_compare_year}'] = net_income_ytd_compare or None
     
     report_data.append(net_income_row)
 
@@ -1776,56 +1868,32 @@ def pl_report_data(request):
     for p in periods:
         # Build columns for this period explicitly in desired order:
         # 1) Company columns, 2) TOTAL, 3) Budget
-        period_cols = []
-        for c in display_companies:  # Use filtered list
-            period_cols.append({
-                'field': f'{p.strftime("%b-%y")}_{c.code}',
-                'headerName': f'{p.strftime("%b-%y")} {c.code}',
-                'width': 120,
-                'type': 'numberColumnWithCommas',
-                'colType': 'company',
-                'periodKey': p.strftime('%Y-%m'),
-                'companyCode': c.code,
-                'cellStyle': {
-                    'textAlign': 'right',
-                    'backgroundColor': color_by_company.get(getattr(c, 'id', None), '#F5F5F5')
-                }
-            })
+        label = period_labels[p]
+        period_key = period_keys[p]
+        period_cols = [
+            _number_col(
+                f'{label}_{c.code}', f'{label} {c.code}', 'company',
+                company_color[c.code],
+                periodKey=period_key, companyCode=c.code,
+            )
+            for c in display_companies  # Use filtered list
+        ]
         # P&L TOTAL per period (existing)
-        period_cols.append({
-            'field': f'{p.strftime("%b-%y")}_TOTAL',
-            'headerName': f'{p.strftime("%b-%y")} TOTAL',
-            'headerComponent': 'periodToggleHeader',
-            'width': 120,
-            'type': 'numberColumnWithCommas',
-            'colType': 'total',
-            'periodKey': p.strftime('%Y-%m'),
-            'cellStyle': {
-                'textAlign': 'right',
-                'backgroundColor': '#FFF9E6'
-            }
-        })
+        period_cols.append(_number_col(
+            f'{label}_TOTAL', f'{label} TOTAL', 'total', '#FFF9E6',
+            headerComponent='periodToggleHeader', periodKey=period_key,
+        ))
         # Add Budget/Forecast consolidated column when viewing Budget or Forecast
-        if data_type and data_type.lower() in ['budget', 'forecast']:
-            period_cols.append({
-                'headerName': f'{p.strftime("%b-%y")} Budget',
-                'field': f'{p.strftime("%b-%y")}_Budget',
-                'type': 'numberColumnWithCommas',
-                'cellClass': 'budget-cell',
-                'colType': 'budget',
-                'cellStyle': {
-                    'textAlign': 'right',
-                    'backgroundColor': '#F0F0FF'
-                },
-                'width': 120
-            })
+        if is_budget_view:
+            period_cols.append(_number_col(
+                f'{label}_Budget', f'{label} Budget', 'budget', '#F0F0FF',
+                cellClass='budget-cell',
+            ))
         # Extend into main column defs in the exact order
         column_defs.extend(period_cols)
         # CF Dashboard TOTAL per period removed to avoid duplicate TOTAL columns
-    # Ensure visual consistency: Non-budget company grand totals first, then overall TOTAL, then budget-only grand total
     # Use filtered pl_companies for column definitions (respects company filter selection)
     non_budget_companies = [c for c in pl_companies if not getattr(c, 'is_budget_only', False)]
-    budget_only_companies = [c for c in companies if getattr(c, 'is_budget_only', False)]
 
     # Display Mode: Grand Total or Year to Date
     if display_mode == 'ytd':
@@ -1835,103 +1903,70 @@ def pl_report_data(request):
         
         # YTD for current year (to_year)
         if to_year:
-            column_defs.append({
-                'field': f'ytd_{to_year}',
-                'headerName': f'YTD {to_year}',
-                'colType': 'ytd_current',
-                'width': 120,
-                'type': 'numberColumnWithCommas',
-                'cellStyle': {
-                    'textAlign': 'right',
-                    'backgroundColor': '#E6F7FF'
-                }
-            })
+            column_defs.append(_number_col(f'ytd_{to_year}', f'YTD {to_year}', 'ytd_current', '#E6F7FF'))
         
         # YTD for comparison year (if selected)
         if ytd_compare_year:
-            column_defs.append({
-                'field': f'ytd_{ytd_compare_year}',
-                'headerName': f'YTD {ytd_compare_year}',
-                'colType': 'ytd_compare',
-                'width': 120,
-                'type': 'numberColumnWithCommas',
-                'cellStyle': {
-                    'textAlign': 'right',
-                    'backgroundColor': '#FFF7E6'
-                }
-            })
+            column_defs.append(_number_col(
+                f'ytd_{ytd_compare_year}', f'YTD {ytd_compare_year}', 'ytd_compare', '#FFF7E6'
+            ))
     else:
         # Grand Total Mode (default): Sum of selected periods
         
         # Grand totals for regular companies
-        for c in non_budget_companies:
-            column_defs.append({
-                'field': f'grand_total_{c.code}',
-                'headerName': f'Grand Total {c.code}',
-                'colType': 'grand_company',
-                'width': 120,
-                'type': 'numberColumnWithCommas',
-                'cellStyle': {
-                    'textAlign': 'right',
-                    'backgroundColor': color_by_company.get(getattr(c, 'id', None), '#F5F5F5')
-                }
-            })
+        column_defs.extend(
+            _number_col(
+                f'grand_total_{c.code}', f'Grand Total {c.code}', 'grand_company',
+                company_color[c.code],
+            )
+            for c in non_budget_companies
+        )
 
         # Overall Grand Total (TOTAL) column
-        column_defs.append({
-            'field': 'grand_total_TOTAL',
-            'headerName': 'Grand Total',
-            'colType': 'grand_overall',
-            'headerComponent': 'grandTotalsToggleHeader',
-            'width': 120,
-            'type': 'numberColumnWithCommas',
-            'cellStyle': {
-                'textAlign': 'right',
-                'backgroundColor': '#FFF9E6'
-            }
-        })
+        column_defs.append(_number_col(
+            'grand_total_TOTAL', 'Grand Total', 'grand_overall', '#FFF9E6',
+            headerComponent='grandTotalsToggleHeader',
+        ))
 
         # Grand Total Budget column (only in Budget/Forecast views) — ensure added only once
-        if data_type and data_type.lower() in ['budget', 'forecast']:
+        if is_budget_view:
             if not any(col.get('field') == 'grand_total_Budget' for col in column_defs):
-                column_defs.append({
-                    'field': 'grand_total_Budget',
-                    'headerName': 'Grand Total Budget',
-                    'colType': 'grand_budget',
-                    'width': 120,
-                    'type': 'numberColumnWithCommas',
-                    'cellStyle': {
-                        'textAlign': 'right',
-                        'backgroundColor': '#F0F0FF'
-                    }
-                })
+                column_defs.append(_number_col(
+                    'grand_total_Budget', 'Grand Total Budget', 'grand_budget', '#F0F0FF'
+                ))
 
         # Grand total for budget-only company (if present) is skipped to avoid field name collision
         # with the overall 'grand_total_Budget' column. This per-company column is unused/empty.
-        for c in budget_only_companies:
-            pass
 
     # CF Dashboard section - loan movements and funding metrics
-    cf_metrics = CFDashboardMetric.objects.filter(is_active=True).order_by('display_order')
     # Guarded date filters for CF data
     cf_query = CFDashboardData.objects.filter(company__in=companies)
     if from_date_start:
         cf_query = cf_query.filter(period__gte=from_date_start)
     if to_date_end:
         cf_query = cf_query.filter(period__lte=to_date_end)
-    cf_data = cf_query.select_related('metric', 'company')
+    # One query, indexed by (company_id, period, metric_id) for the row builder below
+    cf_map = {
+        (company_id, period, metric_id): value
+        for company_id, period, metric_id, value in cf_query.values_list('company_id', 'period', 'metric_id', 'value')
+    }
     
     # Load CF Dashboard Budget/Forecast data (consolidated, not per company)
-    from .models import CFDashboardBudget
     cf_budget_query = CFDashboardBudget.objects.filter(data_type=data_type.lower())
     if from_date_start:
         cf_budget_query = cf_budget_query.filter(period__gte=from_date_start)
     if to_date_end:
         cf_budget_query = cf_budget_query.filter(period__lte=to_date_end)
-    cf_budget_data = cf_budget_query
+    # Stored as floats up front: the row builder writes and sums them without further conversion
+    cf_budget_map = {
+        (metric_id, period): float(value)
+        for metric_id, period, value in cf_budget_query.values_list('metric_id', 'period', 'value')
+    }
     
     # Build CF Dashboard rows
     cf_rows = []
+    # First "Loans advanced in month" row built so far; cumulative metrics add onto it
+    loans_advanced_source = None
     for metric in cf_metrics:
         row = {
             'account_code': '',
@@ -1946,14 +1981,8 @@ def pl_report_data(request):
         is_ytd_metric = ('YTD' in name_val) and not is_cumulative_metric
         
         previous_total = 0  # for YTD accumulation of TOTAL only
-        loans_advanced_row = None
-        
-        # If cumulative, try to find the already-built "Loans advanced in month" row
-        if is_cumulative_metric:
-            for existing_row in cf_rows:
-                if 'Loans advanced in month' in (existing_row.get('account_name') or ''):
-                    loans_advanced_row = existing_row
-                    break
+        total_budget_sum = 0.0  # grand_total_Budget, accumulated in the period loop
+        loans_advanced_row = loans_advanced_source if is_cumulative_metric else None
         
         # Process each period
         for period in periods:
@@ -1961,22 +1990,19 @@ def pl_report_data(request):
 
             # Get values for each company
             for company in display_companies:  # Use filtered list
-                period_key = f"{period.strftime('%b-%y')}_{company.code}"
+                period_key = f"{period_labels[period]}_{company.code}"
                 
                 if is_cumulative_metric:
                     # For January: use input value for cumulative metric
                     if period.month == 1:
-                        cf_value = cf_data.filter(
-                            company=company,
-                            period=period,
-                            metric=metric
-                        ).values_list('value', flat=True).first()
+                        cf_value = cf_map.get((company.id, period, metric.id))
                         value = cf_value or 0
                     else:
                         # Feb-Dec: previous month cumulative + current month loans advanced
                         prev_month = period.month - 1
                         prev_period = period.replace(month=prev_month)
-                        prev_key = f"{prev_period.strftime('%b-%y')}_{company.code}"
+                        prev_label = period_labels[prev_period] if prev_period in period_labels else prev_period.strftime('%b-%y')
+                        prev_key = f"{prev_label}_{company.code}"
                         prev_cumulative = row.get(prev_key, 0)
                         current_loans = 0
                         if loans_advanced_row is not None:
@@ -1984,11 +2010,7 @@ def pl_report_data(request):
                         value = (prev_cumulative or 0) + (current_loans or 0)
                 else:
                     # Regular or YTD metric: use input values per company-month
-                    cf_value = cf_data.filter(
-                        company=company,
-                        period=period,
-                        metric=metric
-                    ).values_list('value', flat=True).first()
+                    cf_value = cf_map.get((company.id, period, metric.id))
                     value = cf_value or 0
                 
                 row[period_key] = value
@@ -1996,11 +2018,11 @@ def pl_report_data(request):
                     company.code in display_company_codes
                     and value not in (None, 0, 0.0)
                 ):
-                    non_zero_company_periods.add((period.strftime('%Y-%m'), company.code))
+                    non_zero_company_periods.add((period_keys[period], company.code))
                 period_total += value
             
             # Calculate TOTAL column
-            period_total_key = f"{period.strftime('%b-%y')}_TOTAL"
+            period_total_key = f"{period_labels[period]}_TOTAL"
             if is_ytd_metric:
                 current_ytd_total = previous_total + period_total
                 row[period_total_key] = current_ytd_total
@@ -2009,30 +2031,26 @@ def pl_report_data(request):
                 row[period_total_key] = period_total
             
             # Add Budget/Forecast consolidated value for this period (single column)
-            if data_type and data_type.lower() in ['budget', 'forecast']:
-                period_budget_key = f"{period.strftime('%b-%y')}_Budget"
-                budget_value = cf_budget_data.filter(
-                    metric=metric,
-                    period=period
-                ).values_list('value', flat=True).first()
-                row[period_budget_key] = float(budget_value) if budget_value is not None else None
-        
-        # CF: Sum per-period Budget values into grand_total_Budget (Budget/Forecast only)
+            if is_budget_view:
+                period_budget_key = f"{period_labels[period]}_Budget"
+                budget_value = cf_budget_map.get((metric.id, period))
+                if budget_value is not None:
+                    total_budget_sum += budget_value
+                row[period_budget_key] = budget_value
+        
+        # CF: per-period Budget values summed above into grand_total_Budget (Budget/Forecast only)
         # Only in Grand Total mode (not YTD)
-        if display_mode == 'grand_total' and data_type and data_type.lower() in ['budget', 'forecast']:
-            total_budget_sum = 0
-            for p in periods:
-                key = f"{p.strftime('%b-%y')}_Budget"
-                val = row.get(key)
-                if val is not None:
-                    try:
-                        total_budget_sum += float(val)
-                    except Exception:
-                        pass
-            row['grand_total_Budget'] = None if total_budget_sum == 0 else float(total_budget_sum)
+        if display_mode == 'grand_total' and is_budget_view:
+            row['grand_total_Budget'] = float(total_budget_sum) if total_budget_sum else None
 
+        if loans_advanced_source is None and 'Loans advanced in month' in name_val:
+            loans_advanced_source = row
         cf_rows.append(row)
 
+    # All sources have contributed (streamed P&L rows and CF metrics); freeze for the lookups below
+    non_zero_company_periods = frozenset(non_zero_company_periods)
+    active_company_codes = frozenset(company_code for _, company_code in non_zero_company_periods)
+
     # Apply visibility to company-period columns after incorporating CF data
     for col in column_defs:
         if col.get('colType') != 'company':
@@ -2043,7 +2061,6 @@ def pl_report_data(request):
             continue
         col['hide'] = (period_key, company_code) not in non_zero_company_periods
 
-    active_company_codes = {company_code for _, company_code in non_zero_company_periods}
     for col in column_defs:
         if col.get('colType') != 'grand_company':
             continue
@@ -2056,13 +2073,6 @@ def pl_report_data(request):
         col['hide'] = company_code not in active_company_codes
 
     # Данные строк для AG Grid
-    def make_row_key(row_dict):
-        """Generate a stable identifier for a P&L row for comment mapping."""
-        sort_part = row_dict.get('sort_order', 0)
-        type_part = row_dict.get('type') or row_dict.get('rowType') or 'row'
-        code_part = row_dict.get('account_code') or row_dict.get('styleToken') or slugify(row_dict.get('account_name', 'row'))
-        return f"{type_part}__{code_part}__{sort_part}"
-
     row_data = []
     
     # Add CF Dashboard rows at the top
@@ -2071,7 +2081,7 @@ def pl_report_data(request):
         cf_row.setdefault('section', 'cf_dashboard')
         cf_row.setdefault('level', 0)
         cf_row.setdefault('styleToken', build_style_token(cf_row.get('account_name')))
-        cf_row.setdefault('rowKey', f"cf__{cf_row.get('styleToken') or slugify(cf_row.get('account_name', 'metric'))}")
+        cf_row.setdefault('rowKey', f"cf__{cf_row.get('styleToken') or _slug(cf_row.get('account_name', 'metric'))}")
         row_data.append(cf_row)
     
     # Add visual separator after CF Dashboard
@@ -2086,9 +2096,34 @@ def pl_report_data(request):
             'styleToken': build_style_token('P&L REPORT separator')
         })
     
+    # Column fields are fixed for the whole report: every grid row starts as a
+    # preallocated dict of them (None = empty cell), so only non-empty values are set below.
+    # Hidden company columns carry no data at all, so their fields are left out of the rows.
+    all_field_names = [
+        col['field'] for col in column_defs
+        if 'field' in col and not (col.get('hide') and col.get('colType') in ('company', 'grand_company'))
+    ]
+    period_fields = [
+        (
+            p,
+            [
+                (c.code, f'{period_labels[p]}_{c.code}') for c in non_budget_companies
+                if (period_keys[p], c.code) in non_zero_company_periods
+            ],
+            f'{period_labels[p]}_TOTAL',
+            f'{period_labels[p]}_Budget',
+        )
+        for p in periods
+    ]
+    grand_company_fields = [
+        (c.code, f'grand_total_{c.code}') for c in non_budget_companies
+        if c.code in active_company_codes
+    ]
+
     # Then add regular P&L rows
     for r in report_data:
-        grid_row = {
+        grid_row = dict.fromkeys(all_field_names)
+        grid_row.update({
             'account_code': r['account_code'],
             'account_name': r['account_name'],
             'rowType': r['type'],
@@ -2096,9 +2131,10 @@ def pl_report_data(request):
             'sort_order': r.get('sort_order', 0),
             'level': r.get('level', 0),
             'styleToken': r.get('styleToken', '')
-        }
+        })
 
-        grid_row['rowKey'] = make_row_key(r)
+        # Stable identifier for comment mapping: type__code-or-token__sort_order
+        grid_row['rowKey'] = f"{r['type']}__{r['account_code'] or r['styleToken'] or _slug(r['account_name'])}__{r['sort_order']}"
 
         sort_order_str = str(grid_row.get('sort_order'))
         row_type = grid_row.get('rowType')
@@ -2112,19 +2148,20 @@ def pl_report_data(request):
         if condition_met:
             grid_row['is_salary'] = True
             grid_row['can_view_details'] = request.user.has_perm('core.view_salary_details')
-        for p in periods:
-            for c in non_budget_companies:
-                field = f'{p.strftime("%b-%y")}_{c.code}'
-                value = r['periods'].get(p, {}).get(c.code, 0)
-                # Send None for zero values so grid shows empty cells
-                grid_row[field] = None if value == 0 or value is None else float(value)
-            field_total = f'{p.strftime("%b-%y")}_TOTAL'
-            total_value = r['periods'].get(p, {}).get('TOTAL', 0)
+        total_budget_sum = 0.0  # grand_total_Budget, accumulated in the period loop
+        for p, company_fields, field_total, field_budget in period_fields:
+            period_values = r['periods'].get(p, {})
+            # Zero values stay None so grid shows empty cells
+            for code, field in company_fields:
+                value = period_values.get(code)
+                if value:
+                    grid_row[field] = value
             # Hide zeros in TOTAL columns as well
-            grid_row[field_total] = None if total_value == 0 or total_value is None else float(total_value)
+            value = period_values.get('TOTAL')
+            if value:
+                grid_row[field_total] = value
             # Populate consolidated Budget for P&L rows under feature flag using dual stream budget_values
-            if is_enabled('PL_BUDGET_PARALLEL') and data_type.lower() in ['budget', 'forecast']:
-                field_budget = f'{p.strftime("%b-%y")}_Budget'
+            if show_budget_column:
                 budget_amount = 0
                 if r['type'] == 'account':
                     acc = r.get('account_code')
@@ -2132,66 +2169,33 @@ def pl_report_data(request):
                         budget_amount = float(budget_values.get(p, {}).get(acc, 0))
                 elif r['type'] in ['sub_total', 'total', 'net_income']:
                     # For subtotal, total, and net_income rows, get the Budget value from the row data
-                    budget_amount = r['periods'].get(p, {}).get('Budget', 0)
-                    if r['type'] == 'sub_total':
-                        # print(f"DEBUG GRID: Processing sub_total row '{r['account_name']}', period {p}, Budget value = {budget_amount}")
-                        pass
-                    elif r['type'] in ['total', 'net_income']:
-                        # print(f"DEBUG GRID: Processing {r['type']} row '{r['account_name']}', period {p}, Budget value = {budget_amount}")
-                        pass
+                    budget_amount = period_values.get('Budget', 0)
                 # For other row types, leave budget empty
-                grid_row[field_budget] = None if not budget_amount else float(budget_amount)
-                # Only show debug for subtotal and total rows, not individual accounts
-                if r['type'] in ['sub_total', 'total', 'net_income']:
-                    # print(f"DEBUG GRID: Set grid_row[{field_budget}] = {grid_row[field_budget]} for row type {r['type']}")
-                    pass
+                if budget_amount:
+                    grid_row[field_budget] = budget_amount
+                    total_budget_sum += float(budget_amount)
         # Populate Grand Total or YTD columns based on display_mode
         if display_mode == 'ytd':
             # YTD Mode: Get real YTD values from row
             if to_year:
-                ytd_value_current = r.get(f'ytd_{to_year}', 0)
-                grid_row[f'ytd_{to_year}'] = None if ytd_value_current == 0 or ytd_value_current is None else float(ytd_value_current)
+                grid_row[f'ytd_{to_year}'] = r.get(f'ytd_{to_year}') or None
             if ytd_compare_year:
-                ytd_value_compare = r.get(f'ytd_{ytd_compare_year}', 0)
-                grid_row[f'ytd_{ytd_compare_year}'] = None if ytd_value_compare == 0 or ytd_value_compare is None else float(ytd_value_compare)
+                grid_row[f'ytd_{ytd_compare_year}'] = r.get(f'ytd_{ytd_compare_year}') or None
         else:
             # Grand Total Mode: Use existing grand_totals
-            for c in non_budget_companies:
-                field = f'grand_total_{c.code}'
-                gt_val = r['grand_totals'].get(c.code, 0)
+            grand_totals = r['grand_totals']
+            for code, field in grand_company_fields:
                 # Hide zero company grand totals by sending None
-                grid_row[field] = None if gt_val == 0 or gt_val is None else float(gt_val)
+                value = grand_totals.get(code)
+                if value:
+                    grid_row[field] = value
             # Overall grand total: hide zero as empty
-            overall_total_value = r['grand_totals'].get('TOTAL', 0)
-            grid_row['grand_total_TOTAL'] = None if overall_total_value == 0 or overall_total_value is None else float(overall_total_value)
+            grid_row['grand_total_TOTAL'] = grand_totals.get('TOTAL') or None
 
-        # P&L: Sum per-period Budget values into grand_total_Budget for all row types (Budget/Forecast only)
+        # P&L: per-period Budget values summed above into grand_total_Budget for all row types (Budget/Forecast only)
         # Only in Grand Total mode (not YTD)
-        if display_mode == 'grand_total' and is_enabled('PL_BUDGET_PARALLEL') and data_type.lower() in ['budget', 'forecast']:
-            total_budget_sum = 0
-            # Only show debug for subtotal and total rows, not individual accounts
-            if r['type'] in ['sub_total', 'total', 'net_income']:
-                # print(f"DEBUG GRAND TOTAL: Calculating for row '{r['account_name']}' (type: {r['type']})")
-                pass
-            for p in periods:
-                key = f"{p.strftime('%b-%y')}_Budget"
-                val = grid_row.get(key)
-                if val is not None:
-                    try:
-                        total_budget_sum += float(val)
-                        if r['type'] in ['sub_total', 'total', 'net_income']:
-                            # print(f"DEBUG GRAND TOTAL:   Added {key} = {val}, running total = {total_budget_sum}")
-                            pass
-                    except Exception:
-                        pass
-                else:
-                    if r['type'] in ['sub_total', 'total', 'net_income']:
-                        # print(f"DEBUG GRAND TOTAL:   {key} = None (skipped)")
-                        pass
-            grid_row['grand_total_Budget'] = None if total_budget_sum == 0 else float(total_budget_sum)
-            if r['type'] in ['sub_total', 'total', 'net_income']:
-                # print(f"DEBUG GRAND TOTAL: Final grand_total_Budget = {grid_row['grand_total_Budget']}")
-                pass
+        if display_mode == 'grand_total' and show_budget_column:
+            grid_row['grand_total_Budget'] = float(total_budget_sum) if total_budget_sum else None
 
         # Стили для разных типов строк
         if r['type'] == 'section_header':
@@ -2218,45 +2222,26 @@ def pl_report_data(request):
                 'styleToken': 'spacer-row',
                 'rowKey': f"spacer__gross_profit__{len(row_data)}",
             }
-            for col in column_defs:
-                field_name = col.get('field')
-                if field_name:
-                    spacer_row[field_name] = None
+            spacer_row.update(dict.fromkeys(all_field_names))
             row_data.append(spacer_row)
 
-    # Build comment summary for visible rows/columns
-    comment_summary = {}
-    if row_data:
-        row_keys_for_comments = {row.get('rowKey') for row in row_data if row.get('rowKey')}
-        if row_keys_for_comments:
-            column_fields = [col.get('field') for col in column_defs if isinstance(col.get('field'), str)]
-            if column_fields:
-                comment_qs = PLComment.objects.filter(row_key__in=row_keys_for_comments, column_key__in=column_fields)
-            else:
-                comment_qs = PLComment.objects.filter(row_key__in=row_keys_for_comments)
-
-            for comment in comment_qs.select_related('created_by'):
-                key = f"{comment.row_key}||{comment.column_key}"
-                entry = comment_summary.setdefault(key, {
-                    'total': 0,
-                    'open': 0,
-                    'latest': None,
-                })
-                entry['total'] += 1
-                if not comment.resolved:
-                    entry['open'] += 1
-                updated_iso = comment.updated_at.isoformat()
-                if not entry['latest'] or updated_iso > entry['latest']:
-                    entry['latest'] = updated_iso
-
     debug_info['ping'] = 'pl_report_data v4 - Fixed indexing and Decimal types'
 
-    return JsonResponse({
+    payload = {
         'columnDefs': column_defs,
         'rowData': row_data,
         'debug_info': debug_info,
-        'commentSummary': comment_summary,
-    })
+    }
+    cache.set(report_cache_key, payload, PL_REPORT_CACHE_TIMEOUT)
+    if comment_summary:
+        payload['commentSummary'] = _pl_comment_summary(row_data, column_defs)
+    return payload
+
+
+@login_required
+def pl_report_data(request):
+    """P&L Report data in JSON format for AG Grid."""
+    return _json_response(_pl_report_payload(request))
 
 
 def _serialize_pl_comment(comment, current_user=None):
@@ -2297,14 +2282,16 @@ def creator_id_matches(current_user, creator):
 
 
 def _comment_summary_for_cell(row_key, column_key):
-    qs = PLComment.objects.filter(row_key=row_key, column_key=column_key)
-    total = qs.count()
-    open_count = qs.filter(resolved=False).count()
-    latest = qs.order_by('-updated_at').values_list('updated_at', flat=True).first()
+    # One aggregate round-trip instead of separate count/filter/order queries
+    summary = PLComment.objects.filter(row_key=row_key, column_key=column_key).aggregate(
+        total=Count('id'),
+        open=Count('id', filter=Q(resolved=False)),
+        latest=Max('updated_at'),
+    )
     return {
-        'total': total,
-        'open': open_count,
-        'latest': latest.isoformat() if latest else None,
+        'total': summary['total'],
+        'open': summary['open'],
+        'latest': summary['latest'].isoformat() if summary['latest'] else None,
     }
 
 
@@ -2315,10 +2302,21 @@ def pl_comment_list(request):
         column_key = request.GET.get('column_key')
         if not row_key or not column_key:
             return JsonResponse({'error': 'row_key and column_key are required'}, status=400)
-        comments = PLComment.objects.filter(row_key=row_key, column_key=column_key).select_related('created_by').order_by('created_at')
+        comments = list(
+            PLComment.objects.filter(row_key=row_key, column_key=column_key)
+            .select_related('created_by')
+            .prefetch_related(Prefetch('files', queryset=PLCommentFile.objects.select_related('uploaded_by')))
+            .order_by('created_at')
+        )
         data = [_serialize_pl_comment(comment, request.user) for comment in comments]
-        summary = _comment_summary_for_cell(row_key, column_key) if comments else {'total': 0, 'open': 0, 'latest': None}
-        return JsonResponse({'comments': data, 'summary': summary})
+        # The thread is already loaded, so the summary needs no further query
+        latest = max((comment.updated_at for comment in comments), default=None)
+        summary = {
+            'total': len(comments),
+            'open': sum(1 for comment in comments if not comment.resolved),
+            'latest': latest.isoformat() if latest else None,
+        }
+        return _json_response({'comments': data, 'summary': summary})
 
     if request.method == 'POST':
         try:
@@ -2334,10 +2332,10 @@ def pl_comment_list(request):
         if not row_key or not column_key:
             return JsonResponse({'error': 'row_key and column_key are required'}, status=400)
 
-        parent = None
-        parent_id = payload.get('parent_id')
-        if parent_id:
-            parent = get_object_or_404(PLComment, pk=parent_id)
+        # The reply only needs the parent's id; check it exists without loading the row
+        parent_id = payload.get('parent_id') or None
+        if parent_id and not PLComment.objects.filter(pk=parent_id).exists():
+            raise Http404('No PLComment matches the given query.')
 
         comment = PLComment.objects.create(
             row_key=row_key,
@@ -2346,7 +2344,7 @@ def pl_comment_list(request):
             column_label=payload.get('column_label', ''),
             message=message,
             created_by=request.user,
-            parent=parent,
+            parent_id=parent_id,
         )
 
         summary = _comment_summary_for_cell(row_key, column_key)
@@ -2360,33 +2358,45 @@ def pl_comment_list(request):
 
 @login_required
 def pl_comment_detail(request, pk):
-    comment = get_object_or_404(PLComment, pk=pk)
+    # The permission checks read the author
+    comment_qs = PLComment.objects.select_related('created_by')
     if request.method == 'PATCH':
-        if not (request.user.is_staff or request.user == comment.created_by):
-            return JsonResponse({'error': 'Permission denied'}, status=403)
-        try:
-            payload = json.loads(request.body.decode('utf-8'))
-        except json.JSONDecodeError:
-            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
-
-        fields_to_update = []
-        if 'message' in payload and isinstance(payload['message'], str):
-            comment.message = payload['message'].strip()
-            fields_to_update.append('message')
-        if 'resolved' in payload:
-            comment.resolved = bool(payload['resolved'])
-            fields_to_update.append('resolved')
-
-        if fields_to_update:
-            fields_to_update.append('updated_at')
-            comment.save(update_fields=fields_to_update)
-
-        summary = _comment_summary_for_cell(comment.row_key, comment.column_key)
+        # Lock the comment row so concurrent edits/resolves of it serialize, and
+        # read the cell summary inside the same transaction
+        with transaction.atomic():
+            # Files (with uploaders) are read back when the updated comment is serialized
+            comment = get_object_or_404(
+                comment_qs.select_for_update(of=('self',)).prefetch_related(
+                    Prefetch('files', queryset=PLCommentFile.objects.select_related('uploaded_by'))
+                ),
+                pk=pk,
+            )
+            if not (request.user.is_staff or request.user == comment.created_by):
+                return JsonResponse({'error': 'Permission denied'}, status=403)
+            try:
+                payload = json.loads(request.body.decode('utf-8'))
+            except json.JSONDecodeError:
+                return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+
+            fields_to_update = []
+            if 'message' in payload and isinstance(payload['message'], str):
+                comment.message = payload['message'].strip()
+                fields_to_update.append('message')
+            if 'resolved' in payload:
+                comment.resolved = bool(payload['resolved'])
+                fields_to_update.append('resolved')
+
+            if fields_to_update:
+                fields_to_update.append('updated_at')
+                comment.save(update_fields=fields_to_update)
+
+            summary = _comment_summary_for_cell(comment.row_key, comment.column_key)
         return JsonResponse({
             'comment': _serialize_pl_comment(comment, request.user),
             'summary': summary,
         })
 
+    comment = get_object_or_404(comment_qs, pk=pk)
     if request.method == 'DELETE':
         if not (request.user.is_staff or request.user == comment.created_by):
             return JsonResponse({'error': 'Permission denied'}, status=403)
@@ -2419,6 +2429,15 @@ def _serialize_pl_comment_file(file_obj, user):
     }
 
 
+PL_COMMENT_FILE_TYPES = frozenset({
+    'application/pdf',
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.ms-excel.sheet.macroEnabled.12',
+})
+PL_COMMENT_FILE_MAX_SIZE = 10 * 1024 * 1024  # 10MB
+
+
 @login_required
 def pl_comment_file_upload(request):
     """Upload a file to a P&L comment."""
@@ -2441,17 +2460,13 @@ def pl_comment_file_upload(request):
             return JsonResponse({'error': 'No file provided'}, status=400)
         
         # Validate file type
-        allowed_types = ['application/pdf', 'application/vnd.ms-excel', 
-                        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                        'application/vnd.ms-excel.sheet.macroEnabled.12']
-        if uploaded_file.content_type not in allowed_types:
+        if uploaded_file.content_type not in PL_COMMENT_FILE_TYPES:
             return JsonResponse({
                 'error': 'Invalid file type. Only PDF and Excel files are allowed.'
             }, status=400)
         
         # Validate file size (max 10MB)
-        max_size = 10 * 1024 * 1024  # 10MB
-        if uploaded_file.size > max_size:
+        if uploaded_file.size > PL_COMMENT_FILE_MAX_SIZE:
             return JsonResponse({
                 'error': 'File too large. Maximum size is 10MB.'
             }, status=400)
@@ -2471,10 +2486,8 @@ def pl_comment_file_upload(request):
         }, status=201)
         
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error uploading file: {error_details}")
-        return JsonResponse({'error': str(e), 'details': error_details}, status=500)
+        logger.exception("Error uploading comment file")
+        return JsonResponse({'error': str(e)}, status=500)
 
 
 @login_required
@@ -2494,6 +2507,7 @@ def pl_comment_file_delete(request, file_id):
 
 
 @login_required
+@condition(etag_func=_bs_report_etag)
 def bs_report_data(request):
     """Balance Sheet Report data in JSON format for AG Grid."""
     from_month = request.GET.get('from_month', '')
@@ -2509,6 +2523,14 @@ def bs_report_data(request):
     
     from_date_start, from_date_end = convert_month_year_to_date_range(from_month, from_year)
     to_date_start, to_date_end = convert_month_year_to_date_range(to_month, to_year)
+
+    # Whole-report cache keyed by the same version stamp as the ETag. The stamp
+    # already covers the company list and the Balance Sheet COA, so a hit skips
+    # loading them as well
+    report_cache_key = f"bs_report:v2:{_bs_report_etag(request)}"
+    cached_payload = cache.get(report_cache_key)
+    if cached_payload is not None:
+        return _json_response(cached_payload)
     
     # Get all companies (exclude pseudo-companies like Budget)
     companies = list(Company.objects.filter(is_budget_only=False).order_by('name'))
@@ -2520,21 +2542,12 @@ def bs_report_data(request):
     company_codes = {c.code for c in companies}
     
     # Get ASSET, LIABILITY, EQUITY accounts from ChartOfAccounts
-    bs_types = [
-        'ASSET', 'LIABILITY', 'EQUITY',
-        'Bank', 'Fixed Asset', 'Other Current Asset', 'Other Asset',
-        'Other Current Liabilities', 'Other Current Liability',
-        'Equity'
-    ]
-    q_objects = Q()
-    for t in bs_types:
-        q_objects |= Q(account_type__iexact=t)
-    chart_accounts = list(ChartOfAccounts.objects.filter(q_objects).order_by('sort_order'))
+    chart_accounts = list(ChartOfAccounts.objects.filter(_bs_account_type_q()).order_by('sort_order'))
     
     # If ChartOfAccounts is empty, return empty data
     if not chart_accounts:
         logger.warning("ChartOfAccounts is empty for Balance Sheet")
-        return JsonResponse({
+        return _json_response({
             'columnDefs': [],
             'rowData': []
         })
@@ -2554,47 +2567,14 @@ def bs_report_data(request):
     
     # If no periods, return empty data
     if not periods:
-        return JsonResponse({
+        return _json_response({
             'columnDefs': [],
             'rowData': []
         })
-    
-    # Pre-fetch all FinancialData for better performance
-    financial_data = {}
-    for period in periods:
-        financial_data[period] = {}
-        for company in companies:
-            financial_data[period][company.code] = {}
-    
-    # Get all FinancialData in one query
-    all_financial_data = FinancialData.objects.filter(
-        data_type=data_type,
-        period__in=periods
-    ).select_related('company')
-    
-    # Organize financial data by period, company, and account
-    for fd in all_financial_data:
-        if fd.period in financial_data and fd.company.code in financial_data[fd.period]:
-            financial_data[fd.period][fd.company.code][fd.account_code] = fd.amount
-
-    # Track which company-period combinations have non-zero data
-    non_zero_company_periods = set()
-    for period, company_map in financial_data.items():
-        period_key = period.strftime('%Y-%m')
-        for company_code, accounts_map in company_map.items():
-            if company_code not in company_codes:
-                continue
-            if any(amount for amount in accounts_map.values()):
-                non_zero_company_periods.add((period_key, company_code))
 
-    # Get companies that actually have data (same logic as P&L report)
-    # Filter to only include companies from our filtered list
-    companies_with_data = list(set(fd.company for fd in all_financial_data if fd.company.code in company_codes))
-    if not companies_with_data:
-        logger.warning("No companies with data found for Balance Sheet, using all companies as fallback")
-        companies_with_data = companies
-    else:
-        logger.info(f"Balance Sheet companies with data: {[c.code for c in companies_with_data]}")
+    # Column labels per period, formatted once: 'Jan-25' for field names, '2025-01' for visibility keys
+    period_labels = {p: p.strftime('%b-%y') for p in periods}
+    period_keys = {p: p.strftime('%Y-%m') for p in periods}
     
     # Group accounts by account_type and sub_category from ChartOfAccounts
     grouped_data = {}
@@ -2614,13 +2594,94 @@ def bs_report_data(request):
         
         # Add account to sub category
         grouped_data[account_type][sub_category].append(account)
-    
-    
-    # Build report data with hierarchical structure
-    report_data = []
-    
+
+    # Amounts live in one period × company × account float matrix, filled from a
+    # single grouped query without instantiating a model (and its Company) per row
+    period_index = {period: i for i, period in enumerate(periods)}
+    company_index = {c.id: i for i, c in enumerate(companies)}
+    account_index = {}
+    for account in chart_accounts:
+        account_index.setdefault(account.account_code, len(account_index))
+    bs_matrix = np.zeros((len(periods), len(companies), len(account_index)))
+
+    window_data = FinancialData.objects.filter(
+        data_type=data_type,
+        period__in=periods,
+        company_id__in=list(company_index),
+    )
+
+    # Which companies / company-period columns carry data is decided in SQL at
+    # (period, company) granularity, over all accounts as before
+    non_zero_company_periods = set()  # Track which company-period combinations have non-zero data
+    company_ids_with_data = set()
+    company_period_rows = window_data.values('period', 'company_id').annotate(nz=Sum(Abs('amount')))
+    for cp in company_period_rows:
+        company_ids_with_data.add(cp['company_id'])
+        if cp['nz']:
+            company_code = companies[company_index[cp['company_id']]].code
+            non_zero_company_periods.add((period_keys[cp['period']], company_code))
+
+    # Only the balance sheet accounts' amounts are fetched for the matrix
+    account_filter = Q(account_code__in=[code for code in account_index if code is not None])
+    if None in account_index:
+        account_filter |= Q(account_code__isnull=True)
+    bs_amounts = window_data.filter(account_filter).values('period', 'company_id', 'account_code').annotate(amt=Sum('amount'))
+    for fd in bs_amounts:
+        if fd['amt']:
+            bs_matrix[
+                period_index[fd['period']],
+                company_index[fd['company_id']],
+                account_index[fd['account_code']],
+            ] = float(fd['amt'])
+
+    # Get companies that actually have data (same logic as P&L report)
+    # Filter to only include companies from our filtered list
+    companies_with_data = [c for c in companies if c.id in company_ids_with_data]
+    if not companies_with_data:
+        logger.warning("No companies with data found for Balance Sheet, using all companies as fallback")
+        companies_with_data = companies
+    else:
+        logger.info(f"Balance Sheet companies with data: {[c.code for c in companies_with_data]}")
+
     # Fixed order for Balance Sheet structure: ASSETS → LIABILITIES → EQUITY
     bs_structure = ['ASSET', 'LIABILITY', 'EQUITY']
+
+    # Sub-category and account-type totals: all reduced by one tensordot
+    account_groups = {}
+    for account_type in bs_structure:
+        for sub_category, accounts in grouped_data.get(account_type, {}).items():
+            sub_codes = [account.account_code for account in accounts]
+            account_groups[(account_type, sub_category)] = sub_codes
+            account_groups.setdefault(account_type, []).extend(sub_codes)
+    group_cells = _aggregate_account_groups(bs_matrix, account_index, account_groups)
+
+    # Every account and group total as one row matrix (period × company × row), so the
+    # per-row period/company/grand totals come from three reductions over the whole
+    # matrix instead of a few NumPy calls per emitted row
+    group_column = {key: len(account_index) + gi for gi, key in enumerate(group_cells)}
+    row_matrix = np.concatenate(
+        [bs_matrix] + [cells[:, :, np.newaxis] for cells in group_cells.values()], axis=2
+    )
+    row_cell_values = row_matrix.transpose(2, 0, 1).tolist()
+    row_period_totals = row_matrix.sum(axis=1).T.tolist()
+    row_company_totals = row_matrix.sum(axis=0).T.tolist()
+    row_grand_totals = row_matrix.sum(axis=(0, 1)).tolist()
+    ordered_company_codes = [company.code for company in companies]
+
+    def fill_row_from_cells(row, column, grand_companies):
+        """Write row_matrix column ``column`` into row['periods'] and row['grand_totals']."""
+        cell_values = row_cell_values[column]
+        period_totals = row_period_totals[column]
+        company_totals = row_company_totals[column]
+        for pi, period in enumerate(periods):
+            period_cells = row['periods'][period] = dict(zip(ordered_company_codes, cell_values[pi]))
+            period_cells['TOTAL'] = period_totals[pi]
+        for company in grand_companies:
+            row['grand_totals'][company.code] = company_totals[company_index[company.id]]
+        row['grand_totals']['TOTAL'] = row_grand_totals[column]
+
+    # Build report data with hierarchical structure
+    report_data = []
     
     # Process each account type in the fixed order
     for account_type in bs_structure:
@@ -2664,35 +2725,7 @@ def bs_report_data(request):
                     'periods': {},
                     'grand_totals': {}
                 }
-                
-                # Calculate period totals for each company
-                for period in periods:
-                    row_data['periods'][period] = {}
-                    period_total = 0
-                    
-                    for company in companies:
-                        amount = financial_data[period][company.code].get(account.account_code, 0)
-                        # Convert to float for AG Grid
-                        row_data['periods'][period][company.code] = float(amount or 0)
-                        period_total += amount or 0
-                    
-                    row_data['periods'][period]['TOTAL'] = float(period_total or 0)
-                
-                # Calculate grand totals
-                for company in companies:
-                    grand_total = sum(
-                        financial_data[period][company.code].get(account.account_code, 0)
-                        for period in periods
-                    )
-                    row_data['grand_totals'][company.code] = float(grand_total or 0)
-                
-                # Calculate overall grand total
-                overall_grand_total = sum(
-                    sum(financial_data[period][company.code].get(account.account_code, 0) for company in companies)
-                    for period in periods
-                )
-                row_data['grand_totals']['TOTAL'] = float(overall_grand_total or 0)
-                
+                fill_row_from_cells(row_data, account_index[account.account_code], companies)
                 report_data.append(row_data)
             
             # Add sub total
@@ -2703,37 +2736,7 @@ def bs_report_data(request):
                 'periods': {},
                 'grand_totals': {}
             }
-            
-            # Calculate sub totals
-            for period in periods:
-                sub_total_data['periods'][period] = {}
-                period_total = 0
-                
-                for company in companies:
-                    company_total = sum(
-                        financial_data[period][company.code].get(account.account_code, 0)
-                        for account in accounts
-                    )
-                    sub_total_data['periods'][period][company.code] = float(company_total or 0)
-                    period_total += company_total or 0
-                
-                sub_total_data['periods'][period]['TOTAL'] = float(period_total or 0)
-            
-            # Calculate grand totals for sub category
-            for company in companies:
-                grand_total = sum(
-                    sum(financial_data[period][company.code].get(account.account_code, 0) for account in accounts)
-                    for period in periods
-                )
-                sub_total_data['grand_totals'][company.code] = float(grand_total or 0)
-            
-            # Calculate overall grand total for sub category
-            overall_grand_total = sum(
-                sum(sum(financial_data[period][company.code].get(account.account_code, 0) for account in accounts) for company in companies_with_data)
-                for period in periods
-            )
-            sub_total_data['grand_totals']['TOTAL'] = float(overall_grand_total or 0)
-            
+            fill_row_from_cells(sub_total_data, group_column[(account_type, sub_category)], companies)
             report_data.append(sub_total_data)
             
             # Add spacer row after sub total
@@ -2746,14 +2749,6 @@ def bs_report_data(request):
             })
         
         # Add account type total
-        # Convert singular to plural for display
-        display_name = account_type
-        if account_type == 'ASSET':
-            display_name = 'ASSETS'
-        elif account_type == 'LIABILITY':
-            display_name = 'LIABILITIES'
-        # EQUITY stays the same
-        
         account_type_total_data = {
             'type': 'parent_total',
             'account_name': f'TOTAL {display_name}',
@@ -2761,37 +2756,7 @@ def bs_report_data(request):
             'periods': {},
             'grand_totals': {}
         }
-        
-        # Calculate account type totals
-        for period in periods:
-            account_type_total_data['periods'][period] = {}
-            period_total = 0
-            
-            for company in companies:
-                company_total = sum(
-                    sum(financial_data[period][company.code].get(account.account_code, 0) for account in sub_accounts)
-                    for sub_accounts in grouped_data[account_type].values()
-                )
-                account_type_total_data['periods'][period][company.code] = float(company_total or 0)
-                period_total += company_total or 0
-            
-            account_type_total_data['periods'][period]['TOTAL'] = float(period_total or 0)
-        
-        # Calculate grand totals for account type
-        for company in companies_with_data:
-            grand_total = sum(
-                sum(sum(financial_data[period][company.code].get(account.account_code, 0) for account in sub_accounts) for sub_accounts in grouped_data[account_type].values())
-                for period in periods
-            )
-            account_type_total_data['grand_totals'][company.code] = float(grand_total or 0)
-        
-        # Calculate overall grand total for account type
-        overall_grand_total = sum(
-            sum(sum(sum(financial_data[period][company.code].get(account.account_code, 0) for account in sub_accounts) for sub_accounts in grouped_data[account_type].values()) for company in companies_with_data)
-            for period in periods
-        )
-        account_type_total_data['grand_totals']['TOTAL'] = float(overall_grand_total or 0)
-        
+        fill_row_from_cells(account_type_total_data, group_column[account_type], companies_with_data)
         report_data.append(account_type_total_data)
         
         # Add spacer row after account type total (except for the last one before CHECK)
@@ -2807,47 +2772,24 @@ def bs_report_data(request):
     
     # Add CHECK row at bottom: TOTAL ASSETS - TOTAL LIABILITIES - TOTAL EQUITY (should equal 0)
     if 'ASSET' in grouped_data and ('LIABILITY' in grouped_data or 'EQUITY' in grouped_data):
-        # Calculate CHECK for each period separately
-        check_periods = {}
-        grand_total_check = 0
-        
-        for period in periods:
-            # Calculate totals for each category for this specific period
-            period_assets = 0
-            period_liabilities = 0
-            period_equity = 0
-            
-            if 'ASSET' in grouped_data:
-                period_assets = sum(
-                    sum(financial_data[period][company.code].get(account.account_code, 0) for account in sub_accounts)
-                    for sub_accounts in grouped_data['ASSET'].values()
-                    for company in companies_with_data
-                )
-            
-            if 'LIABILITY' in grouped_data:
-                period_liabilities = sum(
-                    sum(financial_data[period][company.code].get(account.account_code, 0) for account in sub_accounts)
-                    for sub_accounts in grouped_data['LIABILITY'].values()
-                    for company in companies_with_data
-                )
-            
-            if 'EQUITY' in grouped_data:
-                period_equity = sum(
-                    sum(financial_data[period][company.code].get(account.account_code, 0) for account in sub_accounts)
-                    for sub_accounts in grouped_data['EQUITY'].values()
-                    for company in companies_with_data
-                )
-            
-            period_check = period_assets - period_liabilities - period_equity
-            check_periods[period] = {'TOTAL': float(period_check or 0)}
-            grand_total_check += period_check
+        # CHECK for each period separately, from the account-type totals
+        check_cells = group_cells['ASSET'].copy()
+        for account_type in ('LIABILITY', 'EQUITY'):
+            if account_type in group_cells:
+                check_cells -= group_cells[account_type]
+        period_checks = check_cells.sum(axis=1).tolist()
+        # Company cells stay empty (zero); only the TOTAL columns carry the check
+        check_periods = {
+            period: {**dict.fromkeys(company_codes, 0.0), 'TOTAL': period_checks[pi]}
+            for pi, period in enumerate(periods)
+        }
         
         report_data.append({
             'type': 'check_row',
             'account_name': 'CHECK (Assets - Liabilities - Equity)',
             'account_code': '',
             'periods': check_periods,
-            'grand_totals': {'TOTAL': float(grand_total_check or 0)}
+            'grand_totals': {'TOTAL': float(sum(period_checks))}
         })
     
     # Prepare column definitions for AG Grid
@@ -2876,15 +2818,18 @@ def bs_report_data(request):
     
     # Add period columns
     for period in periods:
+        label = period_labels[period]
         for company in companies:
             column_defs.append({
-                'field': f'{period.strftime("%b-%y")}_{company.code}',
-                'headerName': f'{period.strftime("%b-%y")} {company.code}',
+                'field': f'{label}_{company.code}',
+                'headerName': f'{label} {company.code}',
                 'width': 120,
                 'type': 'numberColumnWithCommas',
                 'colType': 'company',
-                'periodKey': period.strftime('%Y-%m'),
+                'periodKey': period_keys[period],
                 'companyCode': company.code,
+                # Company-period columns without any non-zero amount start hidden
+                'hide': (period_keys[period], company.code) not in non_zero_company_periods,
                 'cellStyle': {
                     'textAlign': 'right',
                     # Styling based on company id instead of code prefix
@@ -2892,48 +2837,66 @@ def bs_report_data(request):
                 }
             })
         column_defs.append({
-            'field': f'{period.strftime("%b-%y")}_TOTAL',
-            'headerName': f'{period.strftime("%b-%y")} TOTAL',
+            'field': f'{label}_TOTAL',
+            'headerName': f'{label} TOTAL',
             'headerComponent': 'periodToggleHeader',
             'width': 120,
             'type': 'numberColumnWithCommas',
             'colType': 'total',
-            'periodKey': period.strftime('%Y-%m'),
+            'periodKey': period_keys[period],
             'cellStyle': {
                 'textAlign': 'right',
                 'backgroundColor': '#FFF9E6'
             }
         })
 
-    for col in column_defs:
-        if col.get('colType') != 'company':
-            continue
-        period_key = col.get('periodKey')
-        company_code = col.get('companyCode')
-        if not period_key or not company_code:
-            continue
-        col['hide'] = (period_key, company_code) not in non_zero_company_periods
-
     
+    # Grid field names per period, built once for all rows
+    period_fields = [
+        (
+            period,
+            [(company.code, f'{period_labels[period]}_{company.code}') for company in companies],
+            f'{period_labels[period]}_TOTAL',
+        )
+        for period in periods
+    ]
+    # Header and spacer rows have no period cells; their grid fields are all zero
+    zero_period_cells = dict.fromkeys(
+        [
+            field_name
+            for _, company_fields, field_total in period_fields
+            for field_name in [*(name for _, name in company_fields), field_total]
+        ],
+        0.0,
+    )
+    # Headers, totals, check rows and spacer rows are kept regardless of their values
+    always_kept_row_types = {'parent_header', 'sub_header', 'sub_total', 'parent_total', 'check_row', 'spacer'}
+
     # Prepare row data for AG Grid
     row_data = []
     for row in report_data:
+        # Skip account rows whose TOTAL columns are all zero within the selected date range
+        if row['type'] not in always_kept_row_types and not any(
+            row['periods'][period]['TOTAL'] for period in periods
+        ):
+            continue
+
         grid_row = {
             'account_code': row['account_code'],
             'account_name': row['account_name'],
             'rowType': row['type']
         }
         
-        # Add period data
-        for period in periods:
-            for company in companies:
-                field_name = f'{period.strftime("%b-%y")}_{company.code}'
-                value = row['periods'].get(period, {}).get(company.code, 0)
-                grid_row[field_name] = float(value or 0)
-            
-            field_name = f'{period.strftime("%b-%y")}_TOTAL'
-            value = row['periods'].get(period, {}).get('TOTAL', 0)
-            grid_row[field_name] = float(value or 0)
+        # Add period data: rows with amounts have every period/company/TOTAL cell filled
+        period_map = row['periods']
+        if period_map:
+            for period, company_fields, field_total in period_fields:
+                period_cells = period_map[period]
+                for code, field_name in company_fields:
+                    grid_row[field_name] = period_cells[code]
+                grid_row[field_total] = period_cells['TOTAL']
+        else:
+            grid_row.update(zero_period_cells)
         
         # Apply row styling based on type
         if row['type'] == 'parent_header':
@@ -2961,33 +2924,13 @@ def bs_report_data(request):
             }
         
         row_data.append(grid_row)
-    
-    # Filter out rows where ALL TOTAL columns sum to zero within selected date range
-    # BUT preserve headers, totals, and check rows regardless of their values
-    filtered_rows = []
-    for row in row_data:
-        row_type = row.get('rowType', 'unknown')
-        
-        # Always keep headers, totals, check rows, and spacer rows
-        if row_type in ['parent_header', 'sub_header', 'sub_total', 'parent_total', 'check_row', 'spacer']:
-            filtered_rows.append(row)
-            continue
-            
-        # For account rows, check if they have non-zero totals
-        total_sum = 0
-        for period in periods:  # Only selected periods
-            total_field = f'{period.strftime("%b-%y")}_TOTAL'
-            total_sum += abs(float(row.get(total_field, 0)))
-        
-        if total_sum != 0:  # Keep account row if any TOTAL is non-zero
-            filtered_rows.append(row)
-    
-    row_data = filtered_rows
-    
-    return JsonResponse({
+
+    payload = {
         'columnDefs': column_defs,
         'rowData': row_data
-    })
+    }
+    cache.set(report_cache_key, payload, BS_REPORT_CACHE_TIMEOUT)
+    return _json_response(payload)
 
 @login_required
 def pl_report(request):
@@ -3075,18 +3018,8 @@ def export_report_excel(request):
 
     # Formatted export for P&L: reuse the same data structure as the screen
     if export_type == 'formatted' and report_type == 'pl':
-        # Call pl_report_data to assemble hierarchical data
-        screen_response = pl_report_data(request)
-        try:
-            screen_json = json.loads(screen_response.content.decode('utf-8'))
-        except Exception:
-            # Fallback: return empty workbook with a note
-            df = pd.DataFrame([["No data"]], columns=["P&L Report"])
-            response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = 'attachment; filename="pl_report_formatted.xlsx"'
-            with pd.ExcelWriter(response, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='P&L Report', index=False)
-            return response
+        # Same hierarchical data as the screen, without a JSON round-trip
+        screen_json = _pl_report_payload(request, comment_summary=False)
 
         row_data = screen_json.get('rowData', [])
         column_defs = screen_json.get('columnDefs', [])
@@ -3116,54 +3049,60 @@ def export_report_excel(request):
                     header.append(k)
                     period_fields.append(k)
 
-        # Assemble rows
-        excel_rows = []
-        for r in row_data:
-            name = r.get('account_name', '')
-            rtype = r.get('rowType', '')
-            values = []
-            for f in period_fields:
-                v = r.get(f, 0)
-                if v == '-':
-                    v = 0
-                try:
-                    v = float(v)
-                except Exception:
-                    v = 0
-                values.append(v)
-            excel_rows.append([name, rtype] + values)
-
-        # Create DataFrame and export
-        df = pd.DataFrame(excel_rows, columns=header)
-
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="pl_report_formatted.xlsx"'
-
-        with pd.ExcelWriter(response, engine='openpyxl') as writer:
-            sheet_name = 'P&L Report'
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-            # Apply basic formatting: bold for subtotal/total/header rows, light fill for totals
-            ws = writer.sheets.get(sheet_name)
-            if ws is not None:
-                # Map row types we want bolded/fill
-                bold_types = {'sub_total', 'parent_total', 'total', 'section_header', 'parent_header', 'net_income'}
-                total_fill = openpyxl.styles.PatternFill(start_color='E8F4FD', end_color='E8F4FD', fill_type='solid')
-                bold_font = openpyxl.styles.Font(bold=True)
-
-                # Iterate DataFrame rows (1-based Excel, header at row 1)
-                type_col_idx = header.index('Type') + 1  # 1-based
-                max_col = ws.max_column
-                for row_idx in range(2, ws.max_row + 1):
-                    row_type_val = ws.cell(row=row_idx, column=type_col_idx).value
-                    if row_type_val in bold_types:
-                        for col_idx in range(1, max_col + 1):
-                            cell = ws.cell(row=row_idx, column=col_idx)
-                            cell.font = bold_font
-                            if row_type_val == 'total':
-                                cell.fill = total_fill
-
-        return response
+        # Assemble rows: numeric cells are coerced column by column, with '-',
+        # missing and non-numeric values becoming 0
+        if period_fields:
+            numeric_values = (
+                pd.DataFrame(row_data, columns=period_fields)
+                .apply(pd.to_numeric, errors='coerce')
+                .fillna(0.0)
+                .to_numpy(dtype=float)
+                .tolist()
+            )
+        else:
+            numeric_values = [[] for _ in row_data]
+        excel_rows = [
+            [r.get('account_name', ''), r.get('rowType', '')] + values
+            for r, values in zip(row_data, numeric_values)
+        ]
+
+        # Write-only workbook: every row is appended once, already styled
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet('P&L Report')
+        _add_report_row_styles(wb)
+
+        # Map row types we want bolded/fill
+        bold_types = {'sub_total', 'parent_total', 'total', 'section_header', 'parent_header', 'net_income'}
+        bold_font = openpyxl.styles.Font(bold=True)
+        # Header row looks like the one DataFrame.to_excel writes
+        thin_side = openpyxl.styles.Side(style='thin')
+        header_border = openpyxl.styles.Border(left=thin_side, right=thin_side, top=thin_side, bottom=thin_side)
+        header_alignment = openpyxl.styles.Alignment(horizontal='center', vertical='top')
+
+        header_cells = []
+        for value in header:
+            cell = openpyxl.cell.WriteOnlyCell(ws, value=value)
+            cell.font = bold_font
+            cell.border = header_border
+            cell.alignment = header_alignment
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        # Apply basic formatting: bold for subtotal/total/header rows, light fill for totals
+        for excel_row in excel_rows:
+            row_type_val = excel_row[1]
+            if row_type_val not in bold_types:
+                ws.append(excel_row)
+                continue
+            row_style = 'report_total' if row_type_val == 'total' else 'report_bold'
+            styled_cells = []
+            for value in excel_row:
+                cell = openpyxl.cell.WriteOnlyCell(ws, value=value)
+                cell.style = row_style
+                styled_cells.append(cell)
+            ws.append(styled_cells)
+
+        return _xlsx_streaming_response('pl_report_formatted.xlsx', wb.save)
     
     if report_type == 'pl':
         accounts = ChartOfAccounts.objects.filter(
@@ -3176,15 +3115,30 @@ def export_report_excel(request):
         ).order_by('sort_order')
         report_title = 'Balance Sheet Report'
     
-    account_codes = accounts.values_list('account_code', flat=True)
-    periods_query = FinancialData.objects.filter(account_code__in=account_codes)
+    accounts = list(accounts)
+    account_codes = [account.account_code for account in accounts]
+    periods_query = FinancialData.objects.filter(account_code__in=account_codes, data_type=data_type)
     
     if from_date_start:
         periods_query = periods_query.filter(period__gte=from_date_start)
     if to_date_end:
         periods_query = periods_query.filter(period__lte=to_date_end)
     
-    periods = periods_query.values_list('period', flat=True).distinct().order_by('period')
+    periods = list(periods_query.values_list('period', flat=True).distinct().order_by('period'))
+    companies = list(companies)
+
+    # All amounts in one grouped query, keyed by (account_code, period, company_id);
+    # streamed in chunks so the queryset never caches the full result next to the dict
+    account_filter = Q(account_code__in=[code for code in account_codes if code is not None])
+    if None in account_codes:
+        account_filter |= Q(account_code__isnull=True)
+    amounts = {}
+    if periods:
+        amount_rows = FinancialData.objects.filter(
+            account_filter, period__in=periods, data_type=data_type
+        ).values('account_code', 'period', 'company_id').annotate(total=Sum('amount'))
+        for fd in amount_rows.iterator(chunk_size=2000):
+            amounts[(fd['account_code'], fd['period'], fd['company_id'])] = fd['total']
     
     # Prepare Excel data
     excel_data = []
@@ -3204,12 +3158,7 @@ def export_report_excel(request):
         for period in periods:
             period_total = 0
             for company in companies:
-                amount = FinancialData.objects.filter(
-                    company=company,
-                    account_code=account.account_code,
-                    period=period,
-                    data_type=data_type
-                ).aggregate(total=Sum('amount'))['total'] or 0
+                amount = amounts.get((account.account_code, period, company.id)) or 0
                 row.append(float(amount))
                 period_total += amount
             row.append(float(period_total))
@@ -3219,32 +3168,22 @@ def export_report_excel(request):
     # Create DataFrame and export
     df = pd.DataFrame(excel_data[1:], columns=excel_data[0])
     
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{report_title.lower().replace(" ", "_")}.xlsx"'
-    
-    with pd.ExcelWriter(response, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name=report_title, index=False)
-    
-    return response
+    return _xlsx_streaming_response(
+        f'{report_title.lower().replace(" ", "_")}.xlsx',
+        lambda fp: df.to_excel(fp, sheet_name=report_title, index=False, engine='openpyxl'),
+    )
 
 
 @login_required
 def export_for_stakeholders(request):
-    import json
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.cell_range import CellRange
     from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
     from decimal import Decimal
     
-    screen_response = pl_report_data(request)
-    try:
-        screen_json = json.loads(screen_response.content.decode('utf-8'))
-    except Exception:
-        df = pd.DataFrame([["No data"]], columns=["P&L Report"])
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="pl_report_stakeholders.xlsx"'
-        with pd.ExcelWriter(response, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='P&L Report', index=False)
-        return response
+    screen_json = _pl_report_payload(request, comment_summary=False)
     
     row_data = screen_json.get('rowData', [])
     column_defs = screen_json.get('columnDefs', [])
@@ -3258,15 +3197,9 @@ def export_for_stakeholders(request):
     ]
     
     if not row_data or not column_defs:
-        df = pd.DataFrame([["No data available"]], columns=["P&L Report"])
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="pl_report_stakeholders.xlsx"'
-        with pd.ExcelWriter(response, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='P&L Report', index=False)
-        return response
-    
-    periods = []
-    companies = []
+        return _empty_xlsx_response('pl_report_stakeholders.xlsx', 'P&L Report', 'No data available')
+    
+    # Period columns grouped per period; dict insertion order is the sheet order
     period_company_map = {}
     grand_total_fields = []
     
@@ -3283,23 +3216,13 @@ def export_for_stakeholders(request):
             continue
         
         if col_type in ('company', 'total', 'budget'):
-            parts = field.split('_')
-            if len(parts) >= 2:
-                period = parts[0]
-                company_or_type = '_'.join(parts[1:])
-                
-                if period not in period_company_map:
-                    period_company_map[period] = []
-                    periods.append(period)
-                
-                period_company_map[period].append({
+            period, sep, _ = field.partition('_')
+            if sep:
+                period_company_map.setdefault(period, []).append({
                     'field': field,
                     'name': header_name,
                     'type': col_type
                 })
-                
-                if company_or_type not in companies and col_type == 'company':
-                    companies.append(company_or_type)
         
         elif col_type in ('grand_company', 'grand_overall', 'grand_budget'):
             if hide_flag:
@@ -3309,11 +3232,8 @@ def export_for_stakeholders(request):
                 'name': header_name,
                 'type': col_type
             })
-            parts = field.split('_')
-            if len(parts) >= 3:
-                company_code = '_'.join(parts[2:])
-                if company_code not in companies and col_type == 'grand_company':
-                    companies.append(company_code)
+    
+    periods = list(period_company_map)
     
     header_row1 = ['Account Name']
     header_row2 = ['']
@@ -3337,134 +3257,128 @@ def export_for_stakeholders(request):
         for col_info in grand_total_fields:
             header_row2.append(col_info['name'])
     
-    excel_rows = []
-    for row in row_data:
-        account_name = row.get('account_name', '')
-        row_type = row.get('rowType', '')
-        
-        excel_row = [account_name]
-        
-        for period in periods:
-            period_cols = period_company_map.get(period, [])
-            for col_info in period_cols:
-                field = col_info['field']
-                value = row.get(field, 0)
-                if value == '-':
-                    value = ''
-                elif value is not None:
-                    try:
-                        value = float(value)
-                    except:
-                        value = ''
-                excel_row.append(value)
-        
-        for col_info in grand_total_fields:
-            field = col_info['field']
-            value = row.get(field, 0)
-            if value == '-':
-                value = ''
-            elif value is not None:
-                try:
-                    value = float(value)
-                except:
-                    value = ''
-            excel_row.append(value)
-        
-        excel_rows.append(excel_row)
+    # Data fields in sheet order: period columns, then grand totals
+    export_fields = [
+        col_info['field']
+        for period in periods
+        for col_info in period_company_map.get(period, [])
+    ] + [col_info['field'] for col_info in grand_total_fields]
+    
+    def export_value(value):
+        # Report cells are already floats (or None for blanks); only other
+        # values need coercing: '-' and unparseable values become blanks
+        if value.__class__ is float or value is None:
+            return value
+        if value == '-':
+            return ''
+        try:
+            return float(value)
+        except Exception:
+            return ''
     
-    all_data = [header_row2] + excel_rows
-    df = pd.DataFrame(all_data[1:], columns=all_data[0])
+    excel_rows = [
+        [row.get('account_name', '')] + [export_value(row.get(field, 0)) for field in export_fields]
+        for row in row_data
+    ]
     
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="pl_report_stakeholders.xlsx"'
+    # Write-only workbook: rows are streamed in order with their styles already set,
+    # so the column layout, outlines and panes have to be configured before the first row
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('P&L Report')
+    max_col = len(header_row2)
     
-    with pd.ExcelWriter(response, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='P&L Report', index=False, startrow=1)
-        ws = writer.sheets['P&L Report']
-        
-        for col_idx, value in enumerate(header_row1, start=1):
-            cell = ws.cell(row=1, column=col_idx)
-            cell.value = value
-            cell.font = Font(bold=True, size=11)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
-        
-        current_col = 2
-        for period in periods:
-            period_cols = period_company_map.get(period, [])
-            num_cols = len(period_cols)
-            
-            if num_cols > 1:
-                ws.merge_cells(start_row=1, start_column=current_col, end_row=1, end_column=current_col + num_cols - 1)
-            
-            current_col += num_cols
-        
-        if grand_total_fields:
-            num_grand = len(grand_total_fields)
-            if num_grand > 1:
-                ws.merge_cells(start_row=1, start_column=current_col, end_row=1, end_column=current_col + num_grand - 1)
-        
-        for col_idx in range(1, len(header_row2) + 1):
-            cell = ws.cell(row=2, column=col_idx)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.fill = PatternFill(start_color='E7E6E6', end_color='E7E6E6', fill_type='solid')
-        
-        bold_types = {'sub_total', 'parent_total', 'total', 'section_header', 'parent_header', 'net_income'}
-        total_fill = PatternFill(start_color='E8F4FD', end_color='E8F4FD', fill_type='solid')
-        bold_font = Font(bold=True)
-        
-        for row_idx in range(3, ws.max_row + 1):
-            excel_row_idx = row_idx - 3
-            if excel_row_idx < len(excel_rows):
-                source_row = row_data[excel_row_idx]
-                row_type = source_row.get('rowType', '')
-                
-                if row_type in bold_types:
-                    for col_idx in range(1, ws.max_column + 1):
-                        cell = ws.cell(row=row_idx, column=col_idx)
-                        cell.font = bold_font
-                        if row_type == 'total':
-                            cell.fill = total_fill
+    ws.column_dimensions['A'].width = 35
+    for col_idx in range(2, max_col + 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = 12
+    
+    excel_col = 2
+    for period in periods:
+        period_cols = period_company_map.get(period, [])
         
-        excel_col = 2
-        for period in periods:
-            period_cols = period_company_map.get(period, [])
-            
-            for i, col_info in enumerate(period_cols):
-                col_letter = get_column_letter(excel_col + i)
-                
-                if col_info['type'] == 'company':
-                    ws.column_dimensions[col_letter].outline_level = 1
+        for i, col_info in enumerate(period_cols):
+            col_letter = get_column_letter(excel_col + i)
             
-            excel_col += len(period_cols)
-        
-        if grand_total_fields:
-            for i, col_info in enumerate(grand_total_fields):
-                col_letter = get_column_letter(excel_col + i)
-                
-                if col_info['type'] == 'grand_company':
-                    ws.column_dimensions[col_letter].outline_level = 1
+            if col_info['type'] == 'company':
+                ws.column_dimensions[col_letter].outline_level = 1
         
-        for row_idx in range(3, ws.max_row + 1):
-            excel_row_idx = row_idx - 3
-            if excel_row_idx < len(excel_rows):
-                source_row = row_data[excel_row_idx]
-                row_type = source_row.get('rowType', '')
-                
-                if row_type == 'account':
-                    ws.row_dimensions[row_idx].outline_level = 1
+        excel_col += len(period_cols)
+    
+    if grand_total_fields:
+        for i, col_info in enumerate(grand_total_fields):
+            col_letter = get_column_letter(excel_col + i)
+            
+            if col_info['type'] == 'grand_company':
+                ws.column_dimensions[col_letter].outline_level = 1
+    
+    ws.sheet_properties.outlinePr.summaryBelow = True
+    ws.sheet_properties.outlinePr.summaryRight = True
+    ws.freeze_panes = 'B3'
+    
+    # Styles are built once and shared by every cell that uses them
+    header_font = Font(bold=True, size=11)
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    header_fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
+    subheader_font = Font(bold=True)
+    subheader_fill = PatternFill(start_color='E7E6E6', end_color='E7E6E6', fill_type='solid')
+    thin_side = Side(style='thin')
+    subheader_border = Border(left=thin_side, right=thin_side, top=thin_side, bottom=thin_side)
+    
+    header_cells = []
+    for value in header_row1:
+        # Blank placeholders fall inside the merged period ranges
+        cell = WriteOnlyCell(ws, value=value or None)
+        cell.font = header_font
+        cell.alignment = header_alignment
+        cell.fill = header_fill
+        header_cells.append(cell)
+    ws.append(header_cells)
+    
+    current_col = 2
+    for period in periods:
+        num_cols = len(period_company_map.get(period, []))
         
-        ws.sheet_properties.outlinePr.summaryBelow = True
-        ws.sheet_properties.outlinePr.summaryRight = True
+        if num_cols > 1:
+            ws.merged_cells.add(CellRange(min_col=current_col, min_row=1, max_col=current_col + num_cols - 1, max_row=1))
         
-        ws.column_dimensions['A'].width = 35
-        for col_idx in range(2, ws.max_column + 1):
-            ws.column_dimensions[get_column_letter(col_idx)].width = 12
+        current_col += num_cols
+    
+    if grand_total_fields:
+        num_grand = len(grand_total_fields)
+        if num_grand > 1:
+            ws.merged_cells.add(CellRange(min_col=current_col, min_row=1, max_col=current_col + num_grand - 1, max_row=1))
+    
+    subheader_cells = []
+    for value in header_row2:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = subheader_font
+        cell.alignment = header_alignment
+        cell.fill = subheader_fill
+        cell.border = subheader_border
+        subheader_cells.append(cell)
+    ws.append(subheader_cells)
+    
+    bold_types = {'sub_total', 'parent_total', 'total', 'section_header', 'parent_header', 'net_income'}
+    _add_report_row_styles(wb)
+    
+    # Body rows: bold/fill the totals, outline the accounts
+    for row_idx, (source_row, excel_row) in enumerate(zip(row_data, excel_rows), start=3):
+        row_type = source_row.get('rowType', '')
+        
+        if row_type in bold_types:
+            row_style = 'report_total' if row_type == 'total' else 'report_bold'
+            styled_cells = []
+            for value in excel_row:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.style = row_style
+                styled_cells.append(cell)
+            ws.append(styled_cells)
+            continue
         
-        ws.freeze_panes = 'B3'
+        if row_type == 'account':
+            ws.row_dimensions[row_idx].outline_level = 1
+        ws.append(excel_row)
     
-    return response
+    return _xlsx_streaming_response('pl_report_stakeholders.xlsx', wb.save)
 
 
 @csrf_exempt
@@ -3586,7 +3500,10 @@ def salary_details(request):
 
     show_all_companies = company_code.upper() == 'ALL'
 
-    base_queryset = SalaryData.objects.select_related('company').filter(
+    # Only the columns the template shows (plus the company code for the all-companies view)
+    base_queryset = SalaryData.objects.select_related('company').only(
+        'employee_id', 'employee_name', 'amount', 'company', 'company__code'
+    ).filter(
         year=year_int,
         month=month_int
     )
@@ -3617,10 +3534,53 @@ def salary_details(request):
     return render(request, 'core/salary_details.html', context)
 
 
+# Month names and abbreviations for salary headers ("Jan-25", "January-2025")
+_SALARY_MONTHS = {
+    **{name.lower(): idx for idx, name in enumerate(calendar.month_name) if name},
+    **{abbr.lower(): idx for idx, abbr in enumerate(calendar.month_abbr) if abbr},
+}
+
+# Everything but digits, dots and minus signs is dropped from salary amounts
+# ("$5,000.00" -> "5000.00"); thousands separators go with the currency symbols
+_SALARY_AMOUNT_JUNK = re.compile(r'[^\d.\-]')
+
+
+@lru_cache(maxsize=64)
+def parse_salary_month_header(raw_header: str) -> tuple[int, int]:
+    """Parse a salary month column header into (month, year).
+
+    Supports "Jan-25" AND "25-Jan" formats. Cached: a file has a dozen or so
+    month columns, but the header is parsed for every non-empty cell.
+    """
+    parts = [p.strip() for p in raw_header.split('-') if p.strip()]
+    if len(parts) != 2:
+        raise ValueError(f"Column '{raw_header}' does not look like a month header")
+
+    def detect_year(token: str) -> int | None:
+        if not token or not token.replace(' ', '').replace("'", '').replace('`', '').isdigit():
+            return None
+        cleaned = ''.join(ch for ch in token if ch.isdigit())
+        if len(cleaned) == 2:
+            return 2000 + int(cleaned)
+        return int(cleaned)
+
+    month_val = _SALARY_MONTHS.get(parts[0].lower())
+    year_val = detect_year(parts[1])
+    if month_val and year_val:
+        return month_val, year_val
+
+    # Try reversed order (e.g. "25-Jan")
+    month_val = _SALARY_MONTHS.get(parts[1].lower())
+    year_val = detect_year(parts[0])
+    if month_val and year_val:
+        return month_val, year_val
+
+    raise ValueError(f"Could not parse month/year from header '{raw_header}'")
+
+
 @login_required
 @permission_required('core.upload_salary_data')
 def upload_salaries(request):
-    import calendar
     from decimal import Decimal
     from django.db import transaction
     
@@ -3628,14 +3588,15 @@ def upload_salaries(request):
         file = request.FILES['file']
         
         try:
-            df = pd.read_csv(file)
+            rows = list(csv.DictReader(io.TextIOWrapper(file.file, encoding='utf-8-sig')))
             
-            # Check all companies exist first
-            company_codes = df['Ent'].unique()
-            missing = []
-            for code in company_codes:
-                if not Company.objects.filter(code=code).exists():
-                    missing.append(code)
+            # Check all companies exist first; they are resolved with one query
+            company_codes = list(dict.fromkeys((row['Ent'] or '').strip() for row in rows))
+            companies_by_code = {
+                company.code: company
+                for company in Company.objects.filter(code__in=company_codes)
+            }
+            missing = [code for code in company_codes if code not in companies_by_code]
             
             if missing:
                 messages.error(request, f"Companies not found: {', '.join(missing)}")
@@ -3643,68 +3604,27 @@ def upload_salaries(request):
             
             # Process in transaction
             with transaction.atomic():
-                # Month header helpers so we support "Jan-25" AND "25-Jan" formats
-                month_abbr_map = {
-                    abbr.lower(): idx for idx, abbr in enumerate(calendar.month_abbr) if abbr
-                }
-                month_name_map = {
-                    name.lower(): idx for idx, name in enumerate(calendar.month_name) if name
-                }
-
-                def parse_month_year(raw_header: str) -> tuple[int, int]:
-                    parts = [p.strip() for p in raw_header.split('-') if p.strip()]
-                    if len(parts) != 2:
-                        raise ValueError(f"Column '{raw_header}' does not look like a month header")
-
-                    def detect_month(token: str) -> int | None:
-                        key = token.lower()
-                        if key in month_abbr_map:
-                            return month_abbr_map[key]
-                        if key in month_name_map:
-                            return month_name_map[key]
-                        return None
-
-                    def detect_year(token: str) -> int | None:
-                        if not token or not token.replace(' ', '').replace("'", '').replace('`', '').isdigit():
-                            return None
-                        cleaned = ''.join(ch for ch in token if ch.isdigit())
-                        if len(cleaned) == 2:
-                            return 2000 + int(cleaned)
-                        return int(cleaned)
-
-                    month_val = detect_month(parts[0])
-                    year_val = detect_year(parts[1])
-                    if month_val and year_val:
-                        return month_val, year_val
-
-                    # Try reversed order (e.g. "25-Jan")
-                    month_val = detect_month(parts[1])
-                    year_val = detect_year(parts[0])
-                    if month_val and year_val:
-                        return month_val, year_val
-
-                    raise ValueError(f"Could not parse month/year from header '{raw_header}'")
-
                 # Get month columns (Jan-25, Feb-25, etc)
-                month_cols = [col for col in df.columns if '-' in str(col)]
+                month_cols = [col for col in (rows[0].keys() if rows else []) if col and '-' in col]
 
-                for _, row in df.iterrows():
-                    company_code = str(row['Ent']).strip()
-                    company = Company.objects.get(code=company_code)
+                # One record per (employee, company, month, year); a later row wins,
+                # as it did with sequential update_or_create calls
+                salaries = {}
+                for row in rows:
+                    company = companies_by_code[(row['Ent'] or '').strip()]
 
                     for month_col in month_cols:
                         cell_value = row[month_col]
-                        if pd.isna(cell_value) or str(cell_value).strip() == '':
+                        if cell_value is None or cell_value.strip() == '':
                             continue
 
                         try:
-                            month_num, year = parse_month_year(str(month_col))
+                            month_num, year = parse_salary_month_header(month_col)
                         except ValueError as exc:
                             raise ValueError(f"{exc} for employee '{row['Employee Name']}'") from exc
 
                         # Clean amount (keep digits, dot and minus)
-                        amount_str = ''.join(ch for ch in str(cell_value) if ch.isdigit() or ch in ['.', '-', ','])
-                        amount_str = amount_str.replace(',', '')
+                        amount_str = _SALARY_AMOUNT_JUNK.sub('', cell_value)
                         if amount_str in ['', '-', '.']:
                             continue
                         try:
@@ -3714,20 +3634,26 @@ def upload_salaries(request):
                                 f"Unable to parse amount '{cell_value}' for {month_col} ({row['Employee Name']})"
                             ) from exc
 
-                        employee_id = str(row['Employee ID']).strip() if pd.notna(row['Employee ID']) else ''
+                        employee_id = (row['Employee ID'] or '').strip()
 
-                        # Create or update
-                        SalaryData.objects.update_or_create(
+                        salaries[(employee_id, company.id, month_num, year)] = SalaryData(
                             employee_id=employee_id,
                             company=company,
                             month=month_num,
                             year=year,
-                            defaults={
-                                'employee_name': str(row['Employee Name']).strip(),
-                                'amount': amount,
-                                'uploaded_by': request.user
-                            }
+                            employee_name=(row['Employee Name'] or '').strip(),
+                            amount=amount,
+                            uploaded_by=request.user,
                         )
+
+                # Create or update, in batched INSERT ... ON CONFLICT statements
+                SalaryData.objects.bulk_create(
+                    list(salaries.values()),
+                    update_conflicts=True,
+                    unique_fields=['employee_id', 'company', 'month', 'year'],
+                    update_fields=['employee_name', 'amount', 'uploaded_by'],
+                    batch_size=1000,
+                )
             
             messages.success(request, 'Salaries uploaded successfully')
             return redirect('upload_salaries')
@@ -3739,24 +3665,40 @@ def upload_salaries(request):
     return render(request, 'core/upload_salaries.html')
 
 
-@login_required
-def download_salary_template(request):
-    import csv
-    from django.http import HttpResponse
-
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="salary_template.csv"'
-
-    writer = csv.writer(response)
+def _build_salary_template():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
     # Header row
     writer.writerow(['Ent', 'Employee ID', 'Employee Name', 'Jan-25', 'Feb-25', 'Mar-25', 'Apr-25', 'May-25', 'Jun-25', 'Jul-25', 'Aug-25', 'Sep-25', 'Oct-25', 'Nov-25', 'Dec-25'])
     # Example rows
     writer.writerow(['FG', 'EMP001', 'John Doe', '$5000.00', '$5000.00', '$5000.00', '$5000.00', '$5000.00', '$5000.00', '$5000.00', '$5000.00', '$5000.00', '$5000.00', '$5000.00', '$5000.00'])
     writer.writerow(['F2', 'EMP002', 'Jane Smith', '$4500.00', '$4500.00', '$4500.00', '', '', '', '', '', '', '', '', ''])
+    return buffer.getvalue().encode('utf-8')
+
+
+# The template is static, so it is rendered once at import time
+SALARY_TEMPLATE_CSV = _build_salary_template()
+
 
+@login_required
+def download_salary_template(request):
+    response = HttpResponse(SALARY_TEMPLATE_CSV, content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="salary_template.csv"'
+    # Login-protected, so only the browser may keep it
+    response['Cache-Control'] = 'private, max-age=86400'
     return response
 
 
+HUBSPOT_METRICS_CACHE_KEY = 'hubspot:financial_metrics'
+HUBSPOT_METRICS_CACHE_TIMEOUT = 45
+HUBSPOT_RECORD_TYPES = frozenset(HubSpotData.RecordType.values)
+# hubspot_data keeps the payloads of one page under about this many bytes
+HUBSPOT_PAGE_TARGET_BYTES = 2 * 1024 * 1024
+HUBSPOT_ROW_BYTES_CACHE_KEY = 'hubspot:avg_row_bytes'
+HUBSPOT_ROW_BYTES_SMOOTHING = 0.2
+HUBSPOT_MAX_DATA_FIELDS = 50
+
+
 @login_required
 @require_http_methods(["POST"])
 def hubspot_sync(request):
@@ -3783,15 +3725,28 @@ def hubspot_sync(request):
         return JsonResponse({'error': str(exc)}, status=500)
 
     action_map = {
-        'deals': service.sync_deals,
-        'companies': service.sync_companies,
-        'contacts': service.sync_contacts,
+        'deals': 'sync_deals',
+        'companies': 'sync_companies',
+        'contacts': 'sync_contacts',
     }
 
+    def run_sync(object_type):
+        # Each worker thread gets its own API client and its own DB connection,
+        # which it has to close itself
+        worker_service = HubSpotService(access_token=service.access_token)
+        try:
+            return getattr(worker_service, action_map[object_type])()
+        finally:
+            connection.close()
+
+    # The object types are fetched from HubSpot concurrently (network-bound)
+    with ThreadPoolExecutor(max_workers=len(objects_to_sync) or 1) as executor:
+        futures = {object_type: executor.submit(run_sync, object_type) for object_type in objects_to_sync}
+
     results = {}
-    for object_type in objects_to_sync:
+    for object_type, future in futures.items():
         try:
-            results[object_type] = action_map[object_type]()
+            results[object_type] = future.result()
         except Exception as exc:  # noqa: BLE001 - we want full traceback logged
             logger.exception("HubSpot %s sync failed", object_type)
             results[object_type] = {
@@ -3808,6 +3763,11 @@ def hubspot_sync(request):
         status_code = 200
 
     metrics = service.get_financial_metrics()
+    cache.set(
+        f"{HUBSPOT_METRICS_CACHE_KEY}:{_hubspot_data_version(request)}",
+        metrics,
+        HUBSPOT_METRICS_CACHE_TIMEOUT,
+    )
 
     return JsonResponse(
         {
@@ -3819,70 +3779,233 @@ def hubspot_sync(request):
     )
 
 
+def _hubspot_metrics_in_thread():
+    """get_financial_metrics() for a worker thread, which must close its own DB connection."""
+    try:
+        return HubSpotService().get_financial_metrics()
+    finally:
+        connection.close()
+
+
+def _hubspot_data_version(request):
+    """Change token for the HubSpot records and sync logs, computed once per request.
+
+    Records are only written through update_or_create, which sets a new
+    synced_at, and every sync adds a log and sets its finished_at; nothing
+    deletes either. So MAXes alone (synced_at from hubspot_synced_idx) tell
+    whether anything changed, without counting the tables.
+    """
+    version = getattr(request, '_hubspot_data_version', None)
+    if version is None:
+        last_synced = HubSpotData.objects.aggregate(last_synced=Max('synced_at'))['last_synced']
+        logs = HubSpotSyncLog.objects.aggregate(last_id=Max('id'), last_finished=Max('finished_at'))
+        signature = (last_synced, logs['last_id'], logs['last_finished'])
+        version = hashlib.sha1(repr(signature).encode()).hexdigest()
+        request._hubspot_data_version = version
+    return version
+
+
+def _hubspot_data_fields(request):
+    """Payload keys requested with ?data_fields=; none when payloads are left out."""
+    if request.GET.get('include_data', '1') == '0':
+        return []
+    return list(dict.fromkeys(
+        key.strip() for key in request.GET.get('data_fields', '').split(',') if key.strip()
+    ))
+
+
+def _hubspot_page_limit(request):
+    """Rows per hubspot_data page, worked out once per request; None for an invalid ?limit=.
+
+    Pages with full payloads are also capped to fit HUBSPOT_PAGE_TARGET_BYTES,
+    based on a moving average of the payload size of the pages served so far.
+    """
+    if not hasattr(request, '_hubspot_page_limit'):
+        limit_param = request.GET.get('limit')
+        try:
+            limit = int(limit_param) if limit_param else 100
+        except (TypeError, ValueError):
+            limit = None
+        else:
+            limit = max(1, min(limit, 500))
+            if request.GET.get('include_data', '1') != '0' and not _hubspot_data_fields(request):
+                avg_row_bytes = cache.get(HUBSPOT_ROW_BYTES_CACHE_KEY)
+                if avg_row_bytes:
+                    limit = min(limit, max(1, HUBSPOT_PAGE_TARGET_BYTES // avg_row_bytes))
+        request._hubspot_page_limit = limit
+    return limit
+
+
+def _hubspot_data_etag(request):
+    """ETag for hubspot_data: the query string, the HubSpot data version and the page size."""
+    # The effective page size, not the raw cap: the average behind the cap moves
+    # with every page served, the page size only when the response would change
+    signature = (sorted(request.GET.lists()), _hubspot_data_version(request), _hubspot_page_limit(request))
+    return hashlib.sha1(repr(signature).encode()).hexdigest()
+
+
 @login_required
 @require_http_methods(["GET"])
+@gzip_page
+@condition(etag_func=_hubspot_data_etag)
 def hubspot_data(request):
     """Return synchronized HubSpot data stored locally along with basic metrics."""
 
     record_type = request.GET.get('record_type')
     if record_type:
         record_type = record_type.strip().lower()
-        if record_type not in HubSpotData.RecordType.values:
+        if record_type not in HUBSPOT_RECORD_TYPES:
             return JsonResponse({'error': 'Invalid record_type provided.'}, status=400)
 
-    limit_param = request.GET.get('limit')
-    try:
-        limit = int(limit_param) if limit_param else 100
-    except (TypeError, ValueError):
+    # Pages with full payloads are capped by their average size as well
+    limit = _hubspot_page_limit(request)
+    if limit is None:
         return JsonResponse({'error': 'limit parameter must be an integer.'}, status=400)
 
-    limit = max(1, min(limit, 500))
+    # ?include_data=0 lists the records without their (possibly large) payloads
+    include_data = request.GET.get('include_data', '1') != '0'
+    # ?data_fields=amount,dealstage returns only those top-level keys of each payload
+    data_fields = _hubspot_data_fields(request)
+    if len(data_fields) > HUBSPOT_MAX_DATA_FIELDS:
+        return JsonResponse(
+            {'error': f'data_fields accepts at most {HUBSPOT_MAX_DATA_FIELDS} keys.'}, status=400
+        )
 
     queryset = HubSpotData.objects.all()
     if record_type:
         queryset = queryset.filter(record_type=record_type)
 
-    queryset = queryset.order_by('-synced_at')
-    total_count = queryset.count()
+    # Keyset pagination: the cursor is the (synced_at, id) of the last row of the
+    # previous page, so deeper pages cost the same as the first one
+    queryset = queryset.order_by('-synced_at', '-id')
+    page_queryset = queryset
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            cursor_synced_at, cursor_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+            cursor_synced_at = datetime.fromisoformat(cursor_synced_at)
+            cursor_id = int(cursor_id)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+        page_queryset = queryset.filter(
+            Q(synced_at__lt=cursor_synced_at) | Q(synced_at=cursor_synced_at, id__lt=cursor_id)
+        )
 
-    entries = [
-        {
-            'hubspot_id': item.hubspot_id,
-            'record_type': item.record_type,
-            'created_at': item.created_at.isoformat(),
-            'synced_at': item.synced_at.isoformat(),
-            'data': item.data,
+    # Metrics scan every synced deal; dashboard refreshes share them for a short
+    # while. The key carries the data version so a sync handled by another worker
+    # cannot leave stale metrics behind a fresh ETag. On a miss they are computed
+    # in a worker thread while this one reads the page and the sync logs
+    metrics_cache_key = f"{HUBSPOT_METRICS_CACHE_KEY}:{_hubspot_data_version(request)}"
+    metrics = cache.get(metrics_cache_key)
+    metrics_executor = None
+    if metrics is None:
+        metrics_executor = ThreadPoolExecutor(max_workers=1)
+        metrics_future = metrics_executor.submit(_hubspot_metrics_in_thread)
+
+    # One extra row tells whether another page follows. The first page carries
+    # the total as COUNT(*) OVER (), so it needs no separate COUNT query; later
+    # pages only see the rows past the cursor and report the total (a separate
+    # COUNT over the full set) only when asked with ?with_count=1
+    page_fields = ('id', 'hubspot_id', 'record_type', 'created_at', 'synced_at')
+    if data_fields:
+        # Postgres extracts the requested keys (data -> 'key'), so the rest of
+        # the payload is neither sent over nor parsed
+        projected = {
+            f'data_field_{index}': Cast(KeyTransform(key, 'data'), TextField())
+            for index, key in enumerate(data_fields)
         }
-        for item in queryset[:limit]
-    ]
+        page_queryset = page_queryset.annotate(**projected)
+        page_fields += tuple(projected)
+    elif include_data:
+        # The payload is read as the stored JSON text and embedded in the response
+        # as is, instead of being parsed into dicts only to be serialized again
+        page_queryset = page_queryset.annotate(data_json=Cast('data', TextField()))
+        page_fields += ('data_json',)
+    # The page, the total and the sync logs are read in one transaction. Inside
+    # it the server-side cursor of iterator() is declared without WITH HOLD, so
+    # Postgres streams the page to it instead of materializing the result first
+    with transaction.atomic():
+        if cursor:
+            page_queryset = page_queryset.values(*page_fields)
+            total_count = queryset.count() if request.GET.get('with_count') == '1' else None
+        else:
+            page_queryset = page_queryset.annotate(total_rows=Window(Count('id'))).values(*page_fields, 'total_rows')
+            total_count = 0
+
+        # Rows are fetched through a server-side cursor in chunks, so payloads are
+        # not all buffered by the driver at once, and go to orjson as dicts: it
+        # writes the datetimes in the same ISO 8601 form isoformat() produced
+        entries = []
+        has_more = False
+        last_key = None
+        data_bytes = 0
+        for entry in page_queryset[:limit + 1].iterator(chunk_size=100):
+            if len(entries) == limit:
+                has_more = True
+                break
+            # id and total_rows are only needed for the cursor and the total
+            last_key = (entry['synced_at'], entry.pop('id'))
+            total_count = entry.pop('total_rows', total_count)
+            if data_fields:
+                data = {}
+                for index, key in enumerate(data_fields):
+                    value = entry.pop(f'data_field_{index}')
+                    data[key] = orjson.Fragment(value) if value is not None else None
+                entry['data'] = data
+            elif include_data:
+                data_json = entry.pop('data_json')
+                if data_json is not None:
+                    data_bytes += len(data_json)
+                    entry['data'] = orjson.Fragment(data_json)
+                else:
+                    entry['data'] = None
+            entries.append(entry)
+        next_cursor = (
+            base64.urlsafe_b64encode(f"{last_key[0].isoformat()}|{last_key[1]}".encode()).decode()
+            if has_more else None
+        )
 
-    recent_logs = [
-        {
-            'id': log.id,
-            'sync_type': log.sync_type,
-            'status': log.status,
-            'started_at': log.started_at.isoformat() if log.started_at else None,
-            'finished_at': log.finished_at.isoformat() if log.finished_at else None,
-            'details': log.details,
-            'error_message': log.error_message,
-        }
-        for log in HubSpotSyncLog.objects.order_by('-started_at')[:10]
-    ]
+        if include_data and not data_fields and entries:
+            # Feed the page's payload size into the average the page size cap is based on
+            page_row_bytes = data_bytes / len(entries)
+            avg_row_bytes = cache.get(HUBSPOT_ROW_BYTES_CACHE_KEY)
+            if avg_row_bytes:
+                page_row_bytes = (
+                    avg_row_bytes * (1 - HUBSPOT_ROW_BYTES_SMOOTHING) + page_row_bytes * HUBSPOT_ROW_BYTES_SMOOTHING
+                )
+            cache.set(HUBSPOT_ROW_BYTES_CACHE_KEY, max(1, int(page_row_bytes)), None)
 
-    try:
-        metrics = HubSpotService().get_financial_metrics()
-    except Exception as exc:  # noqa: BLE001 - ensure API errors are surfaced gracefully
-        logger.exception("Failed to compute HubSpot financial metrics")
-        metrics = {'error': str(exc)}
+        recent_logs = list(
+            HubSpotSyncLog.objects.order_by('-started_at').values(
+                'id', 'sync_type', 'status', 'started_at', 'finished_at', 'details', 'error_message'
+            )[:10]
+        )
 
-    return JsonResponse(
+    if metrics_executor is not None:
+        try:
+            metrics = metrics_future.result()
+        except Exception as exc:  # noqa: BLE001 - ensure API errors are surfaced gracefully
+            logger.exception("Failed to compute HubSpot financial metrics")
+            metrics = {'error': str(exc)}
+        else:
+            cache.set(metrics_cache_key, metrics, HUBSPOT_METRICS_CACHE_TIMEOUT)
+        finally:
+            metrics_executor.shutdown()
+
+    # Up to 500 raw HubSpot payloads: serialized with orjson like the report endpoints
+    response = _json_response(
         {
             'record_type': record_type,
             'limit': limit,
             'total_count': total_count,
             'returned': len(entries),
+            'has_more': has_more,
+            'next_cursor': next_cursor,
             'results': entries,
             'recent_logs': recent_logs,
             'metrics': metrics,
         }
     )
+    # Dashboard polls may reuse the body briefly, then revalidate with the ETag
+    response['Cache-Control'] = 'private, max-age=15'
+    return response